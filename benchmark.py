@@ -0,0 +1,349 @@
+# File: benchmark.py
+# Description: Performance benchmarks for is_email.py
+#
+#   python benchmark.py run [--corpus NAME ...] [--engine parser|dfa] [--save FILE] [--compare FILE]
+#   python benchmark.py importtime [--repeat N] [--save FILE]
+#   python benchmark.py decode [--corpus NAME ...]
+#   python benchmark.py dns [--latency MS] [--size N]
+
+import argparse
+import html
+import json
+import os
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ATEXT = string.ascii_letters + string.digits + "!#$%&'*+-/=?^_`{|}~"
+DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'example.co.uk', 'mail.example.org', 'iana.org']
+
+def tests_xml():
+    tree = ET.parse(os.path.join(HERE, 'tests', 'tests.xml'))
+    return [test.find('address').text or "" for test in tree.getroot().findall('test')]
+
+def typical(rng, size):
+    names = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(200)]
+    return [
+        rng.choice(names) + rng.choice(['', '.', '_', '+']) * rng.randint(0, 1) + rng.choice(names) + str(rng.randint(0, 99)) * rng.randint(0, 1)
+        + '@' + rng.choice(DOMAINS)
+        for _ in range(size)
+    ]
+
+def quoted(rng, size):
+    qtext = ATEXT.replace('&', '') + ' ()<>[]:;@,.'  # No '&' so decode_email() leaves them alone
+    return ['"' + ''.join(rng.choices(qtext, k=60)) + '\\"' + '"@' + rng.choice(DOMAINS) for _ in range(size)]
+
+def comments(rng, size):
+    return [
+        'a' + '(' * depth + 'comment' + ')' * depth + '@' + rng.choice(DOMAINS)
+        for depth in (rng.randint(1, 50) for _ in range(size))
+    ]
+
+def ipv4(rng, size):
+    # Internal systems addressing a handful of hosts by IP
+    hosts = ['.'.join(str(rng.randint(0, 255)) for _ in range(4)) for _ in range(20)]
+    return [rng.choice(['user', 'root', 'alerts', 'noreply']) + '@[' + rng.choice(hosts) + ']' for _ in range(size)]
+
+def ipv6(rng, size):
+    def group():
+        return format(rng.randint(0, 0xffff), 'x')
+    literals = [
+        lambda: ':'.join(group() for _ in range(8)),
+        lambda: ':'.join(group() for _ in range(3)) + '::' + ':'.join(group() for _ in range(3)),
+        lambda: ':'.join(group() for _ in range(6)) + ':' + '.'.join(str(rng.randint(0, 255)) for _ in range(4)),
+    ]
+    return ['test@[IPv6:' + rng.choice(literals)() + ']' for _ in range(size)]
+
+def long(rng, size):
+    # 64 octet local part and a domain that brings the address to 250-254 octets
+    def label(length):
+        return ''.join(rng.choices(string.ascii_lowercase, k=length))
+    return [
+        ''.join(rng.choices(ATEXT, k=64)) + '@' + '.'.join([label(63), label(63), label(rng.randint(56, 60))])
+        for _ in range(size)
+    ]
+
+CORPORA = {
+    'tests.xml': lambda rng, size: tests_xml(),
+    'typical': typical,
+    'quoted': quoted,
+    'comments': comments,
+    'ipv4': ipv4,
+    'ipv6': ipv6,
+    'long': long,
+}
+
+def measure(addresses, repeat=5, engine='parser'):
+    """
+    Time is_email() over addresses. Throughput is taken from the fastest of
+    repeat passes and the latency percentiles from every call in that pass.
+    Memory is measured in a separate pass under tracemalloc, as the mean peak
+    number of bytes allocated during a call.
+    """
+    from is_email import is_email
+
+    clock = time.perf_counter_ns
+    best = None
+    for _ in range(repeat):
+        latencies = []
+        start = clock()
+        for address in addresses:
+            t = clock()
+            is_email(address, False, True, engine=engine)
+            latencies.append(clock() - t)
+        elapsed = clock() - start
+        if best is None or elapsed < best[0]:
+            best = elapsed, latencies
+
+    elapsed, latencies = best
+    latencies.sort()
+
+    tracemalloc.start()
+    try:
+        peak_bytes = 0
+        for address in addresses:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            is_email(address, False, True, engine=engine)
+            peak_bytes += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'addresses': len(addresses),
+        'ops_per_sec': len(addresses) / (elapsed / 1e9),
+        'p50_us': latencies[len(latencies) // 2] / 1000,
+        'p99_us': latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] / 1000,
+        'peak_bytes_per_call': peak_bytes / len(addresses),
+    }
+
+def run(names=None, size=1000, repeat=5, seed=0, engine='parser'):
+    results = {}
+    for name in names or CORPORA:
+        addresses = CORPORA[name](random.Random(seed), size)
+        results[name] = measure(addresses, repeat, engine)
+    return {'python': sys.version.split()[0], 'engine': engine, 'size': size, 'seed': seed, 'corpora': results}
+
+def compare(report, baseline, tolerance=0.1):
+    """
+    Compare a run against a saved baseline. Returns a list of
+    (corpus, metric, baseline value, new value) for each metric that is worse
+    than the baseline by more than tolerance.
+    """
+    regressions = []
+    for name, result in report['corpora'].items():
+        old = baseline['corpora'].get(name)
+        if old is None:
+            continue
+        if result['ops_per_sec'] < old['ops_per_sec'] * (1 - tolerance):
+            regressions.append((name, 'ops_per_sec', old['ops_per_sec'], result['ops_per_sec']))
+        for metric in ('p50_us', 'p99_us', 'peak_bytes_per_call'):
+            if result[metric] > old[metric] * (1 + tolerance):
+                regressions.append((name, metric, old[metric], result[metric]))
+    return regressions
+
+def print_run(report, baseline=None):
+    print(f"{'corpus':<10} {'ops/sec':>10} {'p50 us':>9} {'p99 us':>9} {'bytes/call':>11}")
+    for name, result in report['corpora'].items():
+        line = f"{name:<10} {result['ops_per_sec']:>10.0f} {result['p50_us']:>9.2f} {result['p99_us']:>9.2f} {result['peak_bytes_per_call']:>11.0f}"
+        old = (baseline or {}).get('corpora', {}).get(name)
+        if old:
+            line += f"   ({result['ops_per_sec'] / old['ops_per_sec'] - 1:+.1%} ops/sec)"
+        print(line)
+
+def importtime(module='is_email', repeat=5):
+    """
+    Time importing module in fresh interpreters with python -X importtime.
+
+    Returns a dict of the best and median cumulative import times in
+    microseconds over repeat runs, and the ten slowest modules (by their own
+    import time) from the fastest run.
+    """
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=HERE, capture_output=True, text=True, check=True
+        )
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            timings.append((name.strip(), int(self_us), int(cumulative_us)))
+        total = next(cumulative for name, _, cumulative in timings if name == module)
+        runs.append((total, timings))
+
+    runs.sort(key=lambda run: run[0])
+    best, timings = runs[0]
+    return {
+        'module': module,
+        'python': sys.version.split()[0],
+        'best_us': best,
+        'median_us': statistics.median(total for total, _ in runs),
+        'slowest': [
+            {'module': name, 'self_us': self_us}
+            for name, self_us, _ in sorted(timings, key=lambda timing: -timing[1])[:10]
+        ],
+    }
+
+def print_importtime(report):
+    print(f"import {report['module']}: best {report['best_us'] / 1000:.1f} ms, median {report['median_us'] / 1000:.1f} ms")
+    for timing in report['slowest']:
+        print(f"  {timing['self_us'] / 1000:8.2f} ms  {timing['module']}")
+
+def decode_chained(email):
+    # decode_email() as it was before it was made single-pass, for comparison
+    email = html.unescape(email)
+    return email.replace("\u2400", "\0").replace("\u2407", "\7").replace("\u2409", "\t").replace("\u240A", "\n").replace("\u240D", "\r")
+
+def decode(names=None, size=1000, repeat=5, seed=0):
+    """
+    Time decoding on its own and as part of is_email(). Returns, for each
+    corpus, the best nanoseconds per address over repeat passes for the
+    chained and single-pass decoders and for is_email() with and without
+    decode.
+    """
+    from is_email import decode_email, is_email
+
+    variants = {
+        'decode_chained': decode_chained,
+        'decode_email': decode_email,
+        'is_email': lambda address: is_email(address, False, True),
+        'is_email_no_decode': lambda address: is_email(address, False, True, decode=False),
+    }
+    results = {}
+    for name in names or ['tests.xml', 'typical']:
+        addresses = CORPORA[name](random.Random(seed), size)
+        results[name] = {}
+        for variant, function in variants.items():
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter_ns()
+                for address in addresses:
+                    function(address)
+                elapsed = time.perf_counter_ns() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name][variant] = best / len(addresses)
+    return results
+
+def print_decode(report):
+    print(f"{'corpus':<10} {'chained':>9} {'1-pass':>9} {'is_email':>9} {'no decode':>10}   ns per address")
+    for name, result in report.items():
+        print(f"{name:<10} {result['decode_chained']:>9.0f} {result['decode_email']:>9.0f} {result['is_email']:>9.0f} {result['is_email_no_decode']:>10.0f}")
+
+def dns(size=2000, latency_ms=20.0, seed=0):
+    """
+    Time the DNS check offline, against the zones in tests/dns_fixture.json
+    with latency_ms of latency per query. Addresses are spread over the
+    fixture's domains and as many again that don't exist. Returns, for each
+    way of checking a list and each strategy, the seconds taken and the
+    number of queries made, with a fresh DNS cache each time.
+    """
+    import is_email
+
+    rng = random.Random(seed)
+    fixture = os.path.join(HERE, 'tests', 'dns_fixture.json')
+    with open(fixture) as f:
+        domains = list(json.load(f))
+    domains += [f'missing{i}.example' for i in range(len(domains))]
+    addresses = [f'user{i}@{rng.choice(domains)}' for i in range(size)]
+
+    checkers = {
+        'is_email_many': lambda: list(is_email.is_email_many(addresses, True, True)),
+        'is_email_bulk': lambda: list(is_email.is_email_bulk(addresses, True)),
+    }
+    results = {}
+    saved = is_email.resolver_config, is_email.dns_cache
+    try:
+        for strategy in ('cascade', 'concurrent'):
+            for name, check in checkers.items():
+                backend = is_email.FixtureResolver.load(fixture, latency=latency_ms / 1000)
+                is_email.resolver_config = is_email.ResolverConfig(strategy, backend=backend, retries=0)
+                is_email.dns_cache = is_email.DNSCache()
+                start = time.perf_counter()
+                check()
+                results[f'{name} {strategy}'] = {'seconds': time.perf_counter() - start, 'queries': len(backend.queries)}
+    finally:
+        is_email.resolver_config, is_email.dns_cache = saved
+    return {'addresses': size, 'domains': len(domains), 'latency_ms': latency_ms, 'results': results}
+
+def print_dns(report):
+    print(f"{report['addresses']} addresses at {report['domains']} domains, {report['latency_ms']:g} ms per query")
+    for name, result in report['results'].items():
+        print(f"  {name:<26} {result['seconds']:>7.2f} s {result['queries']:>6} queries")
+
+def save(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for is_email.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='measure is_email() over the benchmark corpora')
+    run_parser.add_argument('--corpus', action='append', choices=list(CORPORA), help='corpus to run (default: all); may be repeated')
+    run_parser.add_argument('--size', type=int, default=1000, help='addresses per generated corpus (default: %(default)s)')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--engine', choices=['parser', 'dfa'], default='parser', help='is_email() engine to measure (default: %(default)s)')
+    run_parser.add_argument('--save', metavar='FILE', help='write the results to FILE as JSON, e.g. to use as a baseline')
+    run_parser.add_argument('--compare', metavar='FILE', help='compare with a baseline saved with --save and fail on regressions')
+    run_parser.add_argument('--tolerance', type=float, default=0.1, help='fractional slow down allowed by --compare (default: %(default)s)')
+
+    importtime_parser = commands.add_parser('importtime', help='time "import is_email" with python -X importtime')
+    importtime_parser.add_argument('--module', default='is_email')
+    importtime_parser.add_argument('--repeat', type=int, default=5)
+    importtime_parser.add_argument('--save', metavar='FILE', help='write the results to FILE as JSON')
+
+    decode_parser = commands.add_parser('decode', help='time decode_email() and is_email(decode=False)')
+    decode_parser.add_argument('--corpus', action='append', choices=list(CORPORA), help='corpus to run (default: tests.xml and typical); may be repeated')
+    decode_parser.add_argument('--size', type=int, default=1000)
+    decode_parser.add_argument('--repeat', type=int, default=5)
+
+    dns_parser = commands.add_parser('dns', help='time the DNS check offline against tests/dns_fixture.json')
+    dns_parser.add_argument('--size', type=int, default=2000)
+    dns_parser.add_argument('--latency', type=float, default=20.0, metavar='MS', help='latency of each query in milliseconds (default: %(default)s)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report = run(args.corpus, args.size, args.repeat, args.seed, args.engine)
+        baseline = None
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        print_run(report, baseline)
+        if args.save:
+            save(report, args.save)
+        if baseline is not None:
+            regressions = compare(report, baseline, args.tolerance)
+            for name, metric, old, new in regressions:
+                print(f'REGRESSION {name} {metric}: {old:.2f} -> {new:.2f}')
+            if regressions:
+                return 1
+
+    elif args.command == 'decode':
+        print_decode(decode(args.corpus, args.size, args.repeat))
+
+    elif args.command == 'dns':
+        print_dns(dns(args.size, args.latency))
+
+    elif args.command == 'importtime':
+        report = importtime(args.module, args.repeat)
+        print_importtime(report)
+        if args.save:
+            save(report, args.save)
+
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -44,9 +44,15 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 # Description: Adaption in Python from Dominic Sayers' PHP is_email. This program is used to validate email addresses.
 
 # IMPORTS
-import dns.resolver, dns.exception
+from array import array
+from collections import OrderedDict, deque
+from functools import lru_cache
+from itertools import islice
 import html
+import os
 import re
+import threading
+import time
 
 # diagnostic constants start
 # This part of the code is generated using data from test/meta.xml. Beware of making manual alterations
@@ -123,8 +129,16 @@ ISEMAIL_ERR_LF_NO_CR = 151
 # End of generated code
 # diagnostic constants end
 
+# Address is valid but the DNS check timed out, so whether the domain has
+# usable records is unknown. Not from test/meta.xml.
+ISEMAIL_DNSWARN_INDETERMINATE = 4
+# The input is longer than ISEMAIL_MAX_INPUT_LENGTH and was rejected without
+# being parsed (see _parse_oversized()). Not from test/meta.xml.
+ISEMAIL_ERR_INPUT_TOOLONG = 152
+
 result_codes = {
     ISEMAIL_VALID: "ISEMAIL_VALID",
+    ISEMAIL_DNSWARN_INDETERMINATE: "ISEMAIL_DNSWARN_INDETERMINATE",
     ISEMAIL_DNSWARN_NO_MX_RECORD: "ISEMAIL_DNSWARN_NO_MX_RECORD",
     ISEMAIL_DNSWARN_NO_RECORD: "ISEMAIL_DNSWARN_NO_RECORD",
     ISEMAIL_RFC5321_TLD: "ISEMAIL_RFC5321_TLD",
@@ -177,6 +191,7 @@ result_codes = {
     ISEMAIL_ERR_FWS_CRLF_END: "ISEMAIL_ERR_FWS_CRLF_END",
     ISEMAIL_ERR_CR_NO_LF: "ISEMAIL_ERR_CR_NO_LF",
     ISEMAIL_ERR_LF_NO_CR: "ISEMAIL_ERR_LF_NO_CR",
+    ISEMAIL_ERR_INPUT_TOOLONG: "ISEMAIL_ERR_INPUT_TOOLONG",
 }
 # function control
 ISEMAIL_THRESHOLD = 16
@@ -210,23 +225,973 @@ ISEMAIL_STRING_IPV6TAG = 'IPv6:'
 # US-ASCII visible characters not valid for atext (https://tools.ietf.org/html/rfc5322#section-3.2.3)
 ISEMAIL_STRING_SPECIALS = '()<>[]:;@\\,."'
 
+# Addresses that are valid for RFC 5321 with nothing unusual about them:
+# a dot-atom local part of at most 64 octets and a domain of LDH labels of
+# at most 63 octets each (https://tools.ietf.org/html/rfc5321#section-4.1.2)
+ISEMAIL_PATTERN_ATEXT = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]"
+ISEMAIL_PATTERN_LABEL = r'[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?'
+_FAST_PATH = re.compile(
+    rf'(?=[^@]{{1,64}}@){ISEMAIL_PATTERN_ATEXT}+(?:\.{ISEMAIL_PATTERN_ATEXT}+)*'
+    rf'@{ISEMAIL_PATTERN_LABEL}(?:\.{ISEMAIL_PATTERN_LABEL})*'
+)
+# The same local part at a domain literal whose contents can't make the
+# address too long or be too long for a single domain element
+_LITERAL_PATH = re.compile(
+    rf'(?=[^@]{{1,64}}@){ISEMAIL_PATTERN_ATEXT}+(?:\.{ISEMAIL_PATTERN_ATEXT}+)*'
+    r'@\[[!-Z^-~]{0,61}\]'
+)
+
+# An IPv4 address at the end of a domain literal, and IPv6 groups of up to
+# four hex digits (see _check_address_literal())
+_ADDRESSLITERAL_IPV4 = re.compile(r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$')
+_ADDRESSLITERAL_IPV6 = re.compile(r'[0-9A-Fa-f]{0,4}(?::[0-9A-Fa-f]{0,4})*$')
+
+# Inputs longer than this are far longer than any address that could be
+# used, and are never parsed, so that an abusive client can't make the
+# parser walk megabytes of comments or quoted strings. Most are rejected with
+# ISEMAIL_ERR_INPUT_TOOLONG (see _parse_oversized())
+ISEMAIL_MAX_INPUT_LENGTH = 4096
+# The characters of a dot-atom local part and a domain of LDH labels, which
+# an oversized input can be checked for at C speed. "&" is left out so that
+# there are no HTML entities to decode.
+_OVERSIZED_LOCAL = re.compile(r"[A-Za-z0-9!#$%'*+/=?^_`{|}~.-]*")
+_OVERSIZED_DOMAIN = re.compile(r'[A-Za-z0-9.-]*')
+
+# Character classes, as bit flags for each US-ASCII character, so that the
+# parser can classify a character with a single lookup. Characters outside
+# US-ASCII are in none of the classes.
+_ATEXT = 0x01  # https://tools.ietf.org/html/rfc5322#section-3.2.3
+_QTEXT = 0x02  # https://tools.ietf.org/html/rfc5322#section-3.2.4 (see below)
+_CTEXT = 0x04  # https://tools.ietf.org/html/rfc5322#section-3.2.2
+_DTEXT = 0x08  # https://tools.ietf.org/html/rfc5322#section-3.4.1
+_OBS_NO_WS_CTL = 0x10  # https://tools.ietf.org/html/rfc5322#section-4.1
+_LET_DIG = 0x20  # https://tools.ietf.org/html/rfc5321#section-4.1.2
+# Characters that have a case of their own in each parser context
+_LOCALPART_DELIMITER = 0x40
+_DOMAIN_DELIMITER = 0x80
+_LITERAL_DELIMITER = 0x100
+_QUOTEDSTRING_DELIMITER = 0x200
+_COMMENT_DELIMITER = 0x400
+
+def _char_classes():
+    delimiters = {
+        _LOCALPART_DELIMITER: '(."\r \t@',
+        _DOMAIN_DELIMITER: '(.[\r \t',
+        _LITERAL_DELIMITER: ']\\\r \t',
+        _QUOTEDSTRING_DELIMITER: '\\\r\t"',
+        _COMMENT_DELIMITER: '()\\\r \t',
+    }
+    classes = []
+    for code in range(128):
+        char = chr(code)
+        flags = 0
+        if 33 <= code <= 126 and char not in ISEMAIL_STRING_SPECIALS:
+            flags |= _ATEXT
+        # SP is FWS by RFC 5322 but is_email() has always kept a lone SP in a
+        # quoted string as it is, without a diagnosis
+        if code in (32, 33) or 35 <= code <= 91 or 93 <= code <= 126:
+            flags |= _QTEXT
+        if 33 <= code <= 39 or 42 <= code <= 91 or 93 <= code <= 126:
+            flags |= _CTEXT
+        if 33 <= code <= 90 or 94 <= code <= 126:
+            flags |= _DTEXT
+        if 1 <= code <= 8 or code in (11, 12, 127) or 14 <= code <= 31:
+            flags |= _OBS_NO_WS_CTL
+        if char.isalnum():
+            flags |= _LET_DIG
+        for flag, chars in delimiters.items():
+            if char in chars:
+                flags |= flag
+        classes.append(flags)
+    return tuple(classes)
+
+_CHAR_CLASSES = _char_classes()
+
+# dnspython is only imported, by _load_dns(), when a DNS check is first made.
+# asyncio and the process pool are likewise imported by the functions that
+# use them, so syntax-only callers don't pay for them at start up.
+dns = None
+
 # For compatibility
 E_ERROR = 1
 E_WARNING = 2
 
+def _load_dns(asynchronous=False):
+    """Import dnspython (and its asynchronous resolver, if asked) on first use"""
+    global dns
+    try:
+        import dns.resolver, dns.exception
+        if asynchronous:
+            import dns.asyncresolver
+    except ImportError as e:
+        raise ImportError("checkDNS needs dnspython; install it with 'pip install dnspython'") from e
+
 def is_bool(x):
     return isinstance(x, bool)
 
+# The Unicode control pictures that tests/tests.xml uses for control characters
+ISEMAIL_CONTROL_PICTURES = str.maketrans({
+    "\u2400": "\0",
+    "\u2407": "\7",
+    "\u2409": "\t",
+    "\u240A": "\n",
+    "\u240D": "\r",
+})
+_CONTROL_PICTURE = re.compile(r'[\u2400\u2407\u2409\u240A\u240D]')
+
 def decode_email(email):
-    email = html.unescape(email)
-    email = email\
-        .replace("\u2400", "\0")\
-        .replace("\u2407", "\7")\
-        .replace("\u2409", "\t")\
-        .replace("\u240A", "\n")\
-        .replace("\u240D", "\r")
+    """
+    Decode HTML entities and then control pictures in an address, as
+    tests/tests.xml writes them. Each step is skipped when the address
+    has nothing for it to decode, which for real addresses is always.
+    """
+    if '&' in email:
+        email = html.unescape(email)
+    if not email.isascii() and _CONTROL_PICTURE.search(email):
+        email = email.translate(ISEMAIL_CONTROL_PICTURES)
     return email
 
+def _text(email, non_ascii='octets', decode=True):
+    """
+    The address as the parser sees it. A str is decoded with decode_email()
+    if decode is true.
+    A bytes-like address (bytes, bytearray or memoryview, e.g. an SMTP
+    envelope address) is taken as it is, with no HTML entities or control
+    pictures to decode, and turned into a str in one step according to
+    non_ascii:
+
+    'octets' reads each octet as one character, so lengths are octet counts
+        and octets above 127 are diagnosed like any non-ASCII character
+    'utf-8' reads the address as UTF-8 (undecodable octets become lone
+        surrogates, which are diagnosed as non-ASCII characters)
+    'strict' raises UnicodeDecodeError (a ValueError) on any non-ASCII octet
+    """
+    if isinstance(email, str):
+        return decode_email(email) if decode else email
+    if non_ascii == 'octets':
+        return str(email, 'latin-1')
+    if non_ascii == 'utf-8':
+        return str(email, 'utf-8', 'surrogateescape')
+    if non_ascii == 'strict':
+        return str(email, 'ascii')
+    raise ValueError(f"non_ascii must be 'octets', 'utf-8' or 'strict', not {non_ascii!r}")
+
+class DiagnosisSet:
+    """
+    The diagnoses raised while checking an address.
+
+    Codes are recorded as bits in an integer mask and the worst (highest)
+    code is maintained as each one is added, so asking for the current
+    status is O(1) no matter how many diagnoses have been raised.
+    """
+    __slots__ = ('mask', 'worst')
+
+    def __init__(self):
+        self.mask = 1 << ISEMAIL_VALID
+        self.worst = ISEMAIL_VALID
+
+    def add(self, code):
+        self.mask |= 1 << code
+        if code > self.worst:
+            self.worst = code
+
+    def __contains__(self, code):
+        return bool(self.mask >> code & 1)
+
+    def codes(self):
+        """Sorted list of the diagnoses, without the redundant ISEMAIL_VALID"""
+        mask = self.mask
+        if mask != 1 << ISEMAIL_VALID:
+            mask &= ~(1 << ISEMAIL_VALID)
+        return [code for code in range(self.worst + 1) if mask >> code & 1]
+
+class _LRUCache:
+    """
+    A bounded, thread safe LRU mapping whose entries may expire, with hit,
+    miss and eviction counters. Expired entries count as misses.
+    """
+    def __init__(self, maxsize, clock):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def _put(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (None if ttl is None else self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+class DNSCache(_LRUCache):
+    """
+    A bounded LRU cache of DNS lookups keyed by (name, rdtype).
+
+    Answers are kept for their record TTL. NXDOMAIN and NoAnswer are cached
+    too, for negative_ttl seconds, so a dead domain is not looked up again
+    for every address at it. The hits, misses and evictions counters can be
+    read at any time; expired entries count as misses.
+
+    :param maxsize: The most lookups to keep before evicting the least recently used
+    :param negative_ttl: Seconds to remember that a name or record does not exist
+    :param clock: Source of the current time in seconds, for testing
+    """
+    def __init__(self, maxsize=10000, negative_ttl=300, clock=time.monotonic):
+        super().__init__(maxsize, clock)
+        self.negative_ttl = negative_ttl
+
+    def get(self, name, rdtype):
+        """The cached outcome of a lookup, or None if there isn't a fresh one"""
+        return self._get((name.lower(), rdtype))
+
+    def put(self, name, rdtype, outcome, ttl):
+        self._put((name.lower(), rdtype), outcome, ttl)
+
+    def __getstate__(self):
+        # Only the settings are pickled, e.g. for worker processes, which
+        # start with an empty cache
+        return {'maxsize': self.maxsize, 'negative_ttl': self.negative_ttl, 'clock': self.clock}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+class ResultCache(_LRUCache):
+    """
+    An opt-in cache of is_email() results for addresses that are checked
+    again and again. Pass one to is_email() or is_email_many() as cache.
+
+    Entries are keyed on the address, checkDNS and the threshold that
+    errorlevel works out to. ASCII addresses without HTML entities are
+    lowercased for the key, since nothing in their diagnosis depends on case.
+    Bytes-like addresses are keyed apart from str ones, and by the non_ascii
+    policy too if they aren't ASCII; other str addresses are keyed by
+    whether they are decoded.
+    Results of DNS checks expire after dns_ttl seconds, and those whose DNS
+    check timed out aren't kept at all; the rest are kept until evicted.
+
+    :param maxsize: The most results to keep before evicting the least recently used
+    :param dns_ttl: Seconds to keep results of DNS checks
+    :param clock: Source of the current time in seconds, for testing
+    """
+    def __init__(self, maxsize=10000, dns_ttl=300, clock=time.monotonic):
+        super().__init__(maxsize, clock)
+        self.dns_ttl = dns_ttl
+
+    @staticmethod
+    def key(email, checkDNS=False, errorlevel=False, non_ascii='octets', decode=True):
+        if not isinstance(email, str):
+            email = bytes(email)
+            email = email.lower() if email.isascii() else (email, non_ascii)
+        elif email.isascii() and '&' not in email:
+            email = email.lower()
+        else:
+            email = (email, bool(decode))
+        return (email, bool(checkDNS)) + _threshold(errorlevel)
+
+    def get(self, key):
+        """(status, diagnoses) for a key from key(), or None if it isn't cached"""
+        return self._get(key)
+
+    def put(self, key, status, diagnoses, checkDNS=False):
+        if ISEMAIL_DNSWARN_INDETERMINATE not in diagnoses:
+            self._put(key, (status, tuple(diagnoses)), self.dns_ttl if checkDNS else None)
+
+class DomainStore:
+    """
+    A persistent store of DNS check verdicts by domain, kept in an SQLite
+    database so that every process using the same file, and every later
+    run, can reuse lookups already made. Set domain_store to one to use it.
+
+    The database is opened in WAL mode, so any number of processes can read
+    it while one writes. Verdicts are kept for ttl seconds if the domain has
+    records and negative_ttl seconds if it has none; an indeterminate verdict
+    from a DNS check that timed out is never stored. Expiry is by wall clock
+    time, as it is shared between processes and runs. Expired rows are
+    ignored until compact() deletes them.
+
+    A DomainStore can be shared between threads, and is reopened in a
+    process forked from the one that opened it.
+
+    :param path: The database file, created if it doesn't exist
+    :param ttl: Seconds to keep the verdict for a domain with records
+    :param negative_ttl: Seconds to keep the verdict for a domain without any
+    :param timeout: Seconds to wait for another process's write to finish
+    :param clock: Source of the current time in seconds, for testing
+    """
+    def __init__(self, path, ttl=86400, negative_ttl=3600, timeout=30, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.clock = clock
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        with self._lock:
+            self._connect()
+
+    def __getstate__(self):
+        # Only the settings are pickled, e.g. for worker processes; each
+        # process opens its own connection
+        return {'path': self.path, 'ttl': self.ttl, 'negative_ttl': self.negative_ttl, 'timeout': self.timeout, 'clock': self.clock}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _connect(self):
+        """The connection for this process, opening it if need be; call with _lock held"""
+        if self._pid != os.getpid():
+            import sqlite3
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS verdicts ('
+                'domain TEXT PRIMARY KEY, dns_checked INTEGER NOT NULL, codes TEXT NOT NULL, record TEXT, expires REAL NOT NULL)'
+            )
+            if not _has_record_column(connection):
+                # A store written before verdicts said which record satisfied
+                # the check; its verdicts say None until they expire
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    if not _has_record_column(connection):
+                        connection.execute('ALTER TABLE verdicts ADD COLUMN record TEXT')
+                    connection.execute('COMMIT')
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def get(self, domain):
+        """The stored (dns_checked, codes, record) verdict for a domain, or None if there isn't a fresh one"""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT dns_checked, codes, record FROM verdicts WHERE domain = ? AND expires > ?', (domain.lower(), self.clock())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return _stored_verdict(*row)
+
+    def put(self, domain, verdict):
+        self.preload([(domain, verdict)])
+
+    def preload(self, verdicts):
+        """
+        Store many (domain, (dns_checked, codes, record)) verdicts, or a mapping of
+        them, in one transaction, e.g. from an earlier run or another store.
+        """
+        if isinstance(verdicts, dict):
+            verdicts = verdicts.items()
+        now = self.clock()
+        rows = [
+            (
+                domain.lower(), int(dns_checked), ' '.join(map(str, codes)), record,
+                now + (self.negative_ttl if ISEMAIL_DNSWARN_NO_RECORD in codes else self.ttl)
+            )
+            for domain, (dns_checked, codes, record) in verdicts
+            if ISEMAIL_DNSWARN_INDETERMINATE not in codes
+        ]
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.executemany('INSERT OR REPLACE INTO verdicts (domain, dns_checked, codes, record, expires) VALUES (?, ?, ?, ?, ?)', rows)
+
+    def items(self):
+        """The fresh (domain, (dns_checked, codes, record)) verdicts, for preload() into another store"""
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT domain, dns_checked, codes, record FROM verdicts WHERE expires > ?', (self.clock(),)
+            ).fetchall()
+        return [(row[0], _stored_verdict(*row[1:])) for row in rows]
+
+    def compact(self):
+        """Delete expired verdicts and reclaim the space they took. Returns the number deleted."""
+        with self._lock:
+            connection = self._connect()
+            deleted = connection.execute('DELETE FROM verdicts WHERE expires <= ?', (self.clock(),)).rowcount
+            connection.execute('VACUUM')
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return deleted
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._connection.close()
+            self._connection = self._pid = None
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM verdicts WHERE expires > ?', (self.clock(),)).fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _has_record_column(connection):
+    """True if a store's verdicts table has the record column"""
+    return any(column[1] == 'record' for column in connection.execute('PRAGMA table_info(verdicts)'))
+
+def _stored_verdict(dns_checked, codes, record):
+    """A verdict from a DomainStore row"""
+    return bool(dns_checked), tuple(int(code) for code in codes.split()), record
+
+# The cache used by the DNS check. Set it to None to always ask the resolver.
+dns_cache = DNSCache()
+
+# A DomainStore shared with other processes and runs, consulted before the
+# DNS is checked for a domain. None (the default) to keep nothing on disk.
+domain_store = None
+
+class ResolverConfig:
+    """
+    How the DNS check queries the DNS. Set resolver_config to one to change
+    it.
+
+    With the 'cascade' strategy, MX records are looked up first, then A
+    records if there are none and then CNAME records if there are none of
+    those either, one query at a time. The 'concurrent' strategy makes MX,
+    A and AAAA queries at once and stops at the first answer that settles
+    the check (an MX record, or without one an A or AAAA record), so it
+    takes one round trip where the cascade can take three. Since A and AAAA
+    queries follow CNAMEs, it accepts a CNAME only if its target has an
+    address, where the cascade accepts any CNAME.
+
+    A query that times out is retried, after a delay that starts at backoff
+    seconds and doubles for each retry. Once a domain's queries have taken
+    lifetime seconds in all, or a query has timed out retries + 1 times, the
+    check gives up with ISEMAIL_DNSWARN_INDETERMINATE.
+
+    :param strategy: 'cascade' or 'concurrent'
+    :param backend: An object to query in place of dnspython, such as a
+                    FixtureResolver, with a resolve(name, rdtype, lifetime=None)
+                    method and a lifetime attribute as dns.resolver.Resolver
+                    has; resolve() may return an awaitable for asynchronous
+                    checks. nameservers and timeout don't apply to it.
+
+    :param nameservers: Addresses of the nameservers to ask, in place of the system's
+    :param timeout: Seconds to wait for a nameserver to answer before trying the next
+    :param lifetime: Seconds the DNS check of a domain may take, across all its
+                     queries and retries; None to only limit each query, as
+                     the resolver does
+    :param retries: The most times to retry a query that timed out
+    :param backoff: Seconds to wait before the first retry
+    """
+    def __init__(self, strategy='cascade', nameservers=None, timeout=None, lifetime=None, retries=3, backoff=0.0, backend=None):
+        if strategy not in ('cascade', 'concurrent'):
+            raise ValueError(f"strategy must be 'cascade' or 'concurrent', not {strategy!r}")
+        self.strategy = strategy
+        self.nameservers = nameservers
+        self.timeout = timeout
+        self.lifetime = lifetime
+        self.retries = retries
+        self.backoff = backoff
+        self.backend = backend
+        self._resolvers = {}
+
+    def __getstate__(self):
+        # dnspython resolvers are set up again in each process
+        state = self.__dict__.copy()
+        state['_resolvers'] = {}
+        return state
+
+    def resolver(self, asynchronous=False):
+        """
+        The backend, or a dnspython resolver (asynchronous, if asked) set up
+        with nameservers and timeout, or None to use the default resolver
+        """
+        if self.backend is not None:
+            return self.backend
+        if self.nameservers is None and self.timeout is None:
+            return None
+
+        resolver = self._resolvers.get(asynchronous)
+        if resolver is None:
+            module = dns.asyncresolver if asynchronous else dns.resolver
+            resolver = module.Resolver(configure=self.nameservers is None)
+            if self.nameservers is not None:
+                resolver.nameservers = list(self.nameservers)
+            if self.timeout is not None:
+                resolver.timeout = self.timeout
+            resolver = self._resolvers[asynchronous] = resolver
+        return resolver
+
+    def deadline(self):
+        """The time.monotonic() by which a DNS check must finish, or None"""
+        return None if self.lifetime is None else time.monotonic() + self.lifetime
+
+    def retry_delay(self, attempt, deadline):
+        """
+        Seconds to wait before retrying a query that has timed out attempt + 1
+        times, or None to give up
+        """
+        if attempt >= self.retries:
+            return None
+        delay = self.backoff * 2 ** attempt
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+resolver_config = ResolverConfig()
+
+class FixtureResolver:
+    """
+    A resolver backend for ResolverConfig that answers from a fixed set of
+    zones instead of the DNS, for reproducible tests and benchmarks of the
+    DNS check offline. zones maps each name to the record types it has:
+
+        {
+            "example.com": {"MX": ["10 mail.example.com."], "A": ["192.0.2.1"]},
+            "www.example.com": {"CNAME": ["example.com."]},
+            "slow.example": {"MX": "timeout"}
+        }
+
+    A name that isn't there raises NXDOMAIN and a record type it doesn't
+    have raises NoAnswer. A record type given as "timeout", "nonameservers",
+    "noanswer" or "nxdomain" instead of records raises that error. CNAMEs
+    are followed for other record types, as a recursive resolver would.
+
+    :param zones: The zones, as above; see load() to read them from JSON
+    :param latency: Seconds each query takes, or a function of (name, rdtype) giving them
+    :param failure_rate: The fraction of other queries that time out, at random
+    :param seed: Seed for the random timeouts
+    :param ttl: The TTL of every answer
+    :param asynchronous: Make resolve() a coroutine, for is_email_async() and friends
+
+    Every query is appended to queries as (name, rdtype).
+    """
+    lifetime = 5.0
+
+    def __init__(self, zones, latency=0.0, failure_rate=0.0, seed=0, ttl=300, asynchronous=False):
+        import random
+
+        self.zones = {name.lower().rstrip('.'): records for name, records in zones.items()}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.ttl = ttl
+        self.asynchronous = asynchronous
+        self.queries = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """A FixtureResolver for the zones in a JSON file"""
+        import json
+
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def resolve(self, name, rdtype, lifetime=None):
+        self.queries.append((name, rdtype))
+        latency = self.latency(name, rdtype) if callable(self.latency) else self.latency
+        with self._lock:
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        if self.asynchronous:
+            return self._resolve_async(name, rdtype, latency, lifetime, fail)
+        time.sleep(min(latency, self.lifetime if lifetime is None else lifetime))
+        return self._answer(name, rdtype, latency, lifetime, fail)
+
+    async def _resolve_async(self, name, rdtype, latency, lifetime, fail):
+        import asyncio
+
+        await asyncio.sleep(min(latency, self.lifetime if lifetime is None else lifetime))
+        return self._answer(name, rdtype, latency, lifetime, fail)
+
+    def _answer(self, name, rdtype, latency, lifetime, fail):
+        if fail or latency > (self.lifetime if lifetime is None else lifetime):
+            raise dns.exception.Timeout(timeout=latency)
+
+        key = name.lower().rstrip('.')
+        for _ in range(8):  # Follow at most this many CNAMEs
+            records = self.zones.get(key)
+            if records is None:
+                raise dns.resolver.NXDOMAIN()
+            answer = records.get(rdtype)
+            if answer is None and rdtype != 'CNAME' and 'CNAME' in records:
+                key = records['CNAME'][0].lower().rstrip('.')
+                continue
+            if answer is None or answer == 'noanswer':
+                raise dns.resolver.NoAnswer()
+            if answer == 'timeout':
+                raise dns.exception.Timeout(timeout=latency)
+            if answer == 'nonameservers':
+                raise dns.resolver.NoNameservers()
+            if answer == 'nxdomain':
+                raise dns.resolver.NXDOMAIN()
+            return _FixtureAnswer(answer, self.ttl)
+        raise dns.resolver.NoAnswer()
+
+class _FixtureAnswer:
+    """The parts of a dns.resolver.Answer that the DNS check uses"""
+
+    def __init__(self, records, ttl):
+        self.records = records
+        self.rrset = _FixtureRRset(ttl)
+
+    def __iter__(self):
+        return iter(self.records)
+
+class _FixtureRRset:
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+class Instrumentation:
+    """
+    Receives measurements from the checks, for a metrics pipeline. Set
+    instrumentation to an instance of a subclass that overrides the methods
+    it needs; the others do nothing. They may be called from several
+    threads at once, and aren't called for checks made in validate_parallel()'s
+    worker processes.
+    """
+    def phase(self, name, seconds):
+        """
+        A phase of a check took seconds: 'decode' for decoding the address,
+        'parse' for parsing it, final length tests included, and 'dns' for
+        the DNS check of a domain, domain_store lookup included
+        """
+
+    def dns_query(self, name, rdtype, seconds, error):
+        """
+        A query was answered, or failed with error (a dnspython exception),
+        after seconds. Queries answered from dns_cache aren't reported.
+        """
+
+    def dns_retry(self, name, rdtype, attempt, delay):
+        """A query that timed out is to be retried for the attempt'th time after delay seconds"""
+
+    def cache(self, name, hit):
+        """
+        A lookup in a cache hit or missed: 'result' for a ResultCache, 'dns'
+        for dns_cache and 'store' for domain_store
+        """
+
+    def result(self, diagnosis, category):
+        """
+        An address was diagnosed: diagnosis is its worst diagnosis, whatever
+        the errorlevel, and category is the category it falls in, such as
+        ISEMAIL_RFC5321. Results taken from a ResultCache aren't reported.
+        """
+
+class Metrics(Instrumentation):
+    """
+    Instrumentation that totals what it receives, for reading with stats()
+    and reporting however suits. Thread safe.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def phase(self, name, seconds):
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0) + 1
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+
+    def dns_query(self, name, rdtype, seconds, error):
+        with self._lock:
+            self._queries[rdtype] = self._queries.get(rdtype, 0) + 1
+            if error is not None:
+                error = type(error).__name__
+                self._errors[error] = self._errors.get(error, 0) + 1
+
+    def dns_retry(self, name, rdtype, attempt, delay):
+        with self._lock:
+            self._retries[rdtype] = self._retries.get(rdtype, 0) + 1
+
+    def cache(self, name, hit):
+        counts = self._hits if hit else self._misses
+        with self._lock:
+            counts[name] = counts.get(name, 0) + 1
+
+    def result(self, diagnosis, category):
+        with self._lock:
+            self._categories[category] = self._categories.get(category, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._phases = {}
+            self._seconds = {}
+            self._queries = {}
+            self._errors = {}
+            self._retries = {}
+            self._hits = {}
+            self._misses = {}
+            self._categories = {}
+
+    def stats(self):
+        """
+        The totals so far: for each phase its count and seconds, and counts
+        of DNS queries and retries by record type, of failed queries by
+        exception, of cache hits and misses by cache and of results by
+        category
+        """
+        with self._lock:
+            return {
+                'phases': {name: {'count': count, 'seconds': self._seconds[name]} for name, count in self._phases.items()},
+                'dns_queries': dict(self._queries),
+                'dns_errors': dict(self._errors),
+                'dns_retries': dict(self._retries),
+                'cache_hits': dict(self._hits),
+                'cache_misses': dict(self._misses),
+                'categories': dict(self._categories)
+            }
+
+# The Instrumentation that checks report to. None (the default) to report
+# nothing, at the cost of no more than checking that it is None.
+instrumentation = None
+
+def _resolve(name, rdtype, config, deadline=None):
+    """
+    dns.resolver.resolve() through dns_cache, for when only the existence of
+    an answer matters. A cached negative answer is raised again as the same
+    exception type that the resolver raised. The query is made as config, a
+    ResolverConfig, says and must be answered by deadline, if there is one.
+    """
+    if _cached(name, rdtype):
+        return
+
+    resolver = config.resolver()
+    hooks = instrumentation
+    if hooks is not None:
+        start = time.perf_counter()
+    try:
+        answer = (resolver or dns.resolver).resolve(name, rdtype, **_lifetime(resolver, deadline))
+    except dns.exception.DNSException as e:
+        if hooks is not None:
+            hooks.dns_query(name, rdtype, time.perf_counter() - start, e)
+        if isinstance(e, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)):
+            _remember(name, rdtype, e)
+        raise
+
+    if hooks is not None:
+        hooks.dns_query(name, rdtype, time.perf_counter() - start, None)
+    _remember(name, rdtype, answer)
+
+async def _resolve_async(name, rdtype, config, deadline=None):
+    """_resolve() using dns.asyncresolver"""
+    if _cached(name, rdtype):
+        return
+
+    resolver = config.resolver(asynchronous=True)
+    hooks = instrumentation
+    if hooks is not None:
+        start = time.perf_counter()
+    try:
+        answer = (resolver or dns.asyncresolver).resolve(name, rdtype, **_lifetime(resolver, deadline))
+        if hasattr(answer, '__await__'):
+            answer = await answer
+    except dns.exception.DNSException as e:
+        if hooks is not None:
+            hooks.dns_query(name, rdtype, time.perf_counter() - start, e)
+        if isinstance(e, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)):
+            _remember(name, rdtype, e)
+        raise
+
+    if hooks is not None:
+        hooks.dns_query(name, rdtype, time.perf_counter() - start, None)
+    _remember(name, rdtype, answer)
+
+def _lifetime(resolver, deadline):
+    """
+    The keyword arguments for a query that must be answered by deadline, if
+    there is one, raising Timeout if it has already passed
+    """
+    if deadline is None:
+        return {}
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise dns.exception.Timeout(timeout=0.0)
+    return {'lifetime': remaining if resolver is None else min(remaining, resolver.lifetime)}
+
+def _cached(name, rdtype):
+    """True if dns_cache holds an answer, raising if it holds a negative one"""
+    cache = dns_cache
+    if cache is None:
+        return False
+
+    outcome = cache.get(name, rdtype)
+    hooks = instrumentation
+    if hooks is not None:
+        hooks.cache('dns', outcome is not None)
+    if outcome is None:
+        return False
+    if outcome is not True:
+        raise outcome()
+    return True
+
+def _remember(name, rdtype, outcome):
+    """Store an answer or a negative-answer exception in dns_cache"""
+    cache = dns_cache
+    if cache is None:
+        return
+
+    if isinstance(outcome, dns.exception.DNSException):
+        cache.put(name, rdtype, type(outcome), cache.negative_ttl)
+    else:
+        cache.put(name, rdtype, True, outcome.rrset.ttl)
+
+# Stands in a component's spans for the single space that folding white space
+# inside a quoted string is read as
+_SPACE = (-1, -1)
+
+class _Components:
+    """
+    Where the components of a parsed address are in the decoded address.
+
+    Each component is kept as a flat list of [start, end, start, end, ...]
+    offsets into email rather than as a string, so parsing doesn't copy
+    the address a character at a time; the strings are only built when
+    asked for. local_dots and domain_dots are the offsets within the built
+    component of the dots between its elements, or None if it can simply be
+    split on its dots. literal_spans is None if there is no domain literal.
+    """
+    __slots__ = ('email', 'local_spans', 'domain_spans', 'literal_spans', 'local_dots', 'domain_dots')
+
+    def __init__(self, email, local_spans, domain_spans):
+        self.email = email
+        self.local_spans = local_spans
+        self.domain_spans = domain_spans
+        self.literal_spans = None
+        self.local_dots = None
+        self.domain_dots = None
+
+    def local_part(self):
+        return self._join(self.local_spans)
+
+    def domain(self):
+        return self._join(self.domain_spans)
+
+    def literal(self):
+        return None if self.literal_spans is None else self._join(self.literal_spans)
+
+    def local_atoms(self):
+        return self._split(self.local_part(), self.local_dots)
+
+    def domain_atoms(self):
+        return self._split(self.domain(), self.domain_dots)
+
+    def tld(self):
+        """The last element of the domain"""
+        domain = self.domain()
+        if self.domain_dots is None:
+            return domain[domain.rfind(ISEMAIL_STRING_DOT) + 1:]
+        return domain[self.domain_dots[-1] + 1:] if self.domain_dots else domain
+
+    def _join(self, spans):
+        email = self.email
+        if len(spans) == 2:
+            return ISEMAIL_STRING_SP if spans[0] < 0 else email[spans[0]:spans[1]]
+        return ''.join(
+            ISEMAIL_STRING_SP if spans[k] < 0 else email[spans[k]:spans[k + 1]]
+            for k in range(0, len(spans), 2)
+        )
+
+    @staticmethod
+    def _split(component, dots):
+        if dots is None:
+            return component.split(ISEMAIL_STRING_DOT)
+        atoms = []
+        start = 0
+        for dot in dots:
+            atoms.append(component[start:dot])
+            start = dot + 1
+        atoms.append(component[start:])
+        return atoms
+
+class EmailResult:
+    """
+    What validate() found out about an address.
+
+    status is what is_email() would have returned and diagnoses is the
+    sorted tuple of every diagnosis raised. local_part and domain are the
+    address components as is_email() parses them (the domain includes the
+    brackets of a domain literal, whose contents are also in literal);
+    local_atoms and domain_atoms are their dot-separated elements. These
+    are built from the parse on first use. dns_checked is true if a DNS
+    check found an MX record, and dns_record is the type of record ('MX',
+    'A', 'AAAA' or 'CNAME') that satisfied the DNS check, if one did.
+    """
+    __slots__ = ('email', 'status', 'diagnoses', 'dns_checked', 'dns_record', '_components')
+
+    def __init__(self, email, components, status, diagnoses, dns_checked=False, dns_record=None):
+        self.email = email
+        self._components = components
+        self.status = status
+        self.diagnoses = diagnoses
+        self.dns_checked = dns_checked
+        self.dns_record = dns_record
+
+    @property
+    def local_part(self):
+        return self._components.local_part()
+
+    @property
+    def domain(self):
+        return self._components.domain()
+
+    @property
+    def literal(self):
+        return self._components.literal()
+
+    @property
+    def local_atoms(self):
+        return self._components.local_atoms()
+
+    @property
+    def domain_atoms(self):
+        return self._components.domain_atoms()
+
+    def __repr__(self):
+        return f"EmailResult({self.email!r}, status={result_codes.get(self.status, self.status)})"
+
 """
 Check that an email address conforms to RFCs 5321, 5322 and others
 
@@ -251,50 +1216,682 @@ and obsolete forms are not allowed)
 
                     NB Note the difference between errorlevel = false and
                     errorlevel = 0
-:param parsedata: If passed, returns the parsed address components
+:param parsedata: If passed a dict, it is filled with the parsed address
+                    components and the list of diagnoses under 'status'.
+                    validate() returns the same information as an EmailResult.
+:param cache: If passed a ResultCache, results are remembered there and
+                    repeated addresses are answered from it (unless parsedata
+                    is wanted too)
+:param engine: 'parser' to parse with the character by character parser or
+                    'dfa' to try the table-driven DFA first; the results are
+                    the same
+:param non_ascii: How non-ASCII octets are read when email is bytes,
+                    bytearray or memoryview: 'octets', 'utf-8' or 'strict'.
+                    Bytes-like addresses aren't HTML-decoded.
+:param decode: If true (the default), HTML entities and control pictures in
+                    a str address are decoded with decode_email() first, as
+                    tests/tests.xml needs. Callers with plain addresses can
+                    pass False to skip it.
 """
-def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
-    if (is_bool(errorlevel)):
-        threshold = ISEMAIL_VALID
-        diagnose = bool(errorlevel)
-    else:
-        diagnose = True
+def is_email(email, checkDNS=False, errorlevel=False, parsedata=None, cache=None, engine='parser', non_ascii='octets', decode=True):
+    key = None
+    if cache is not None:
+        key = cache.key(email, checkDNS, errorlevel, non_ascii, decode)
+        if parsedata is None:
+            cached = cache.get(key)
+            hooks = instrumentation
+            if hooks is not None:
+                hooks.cache('result', cached is not None)
+            if cached is not None:
+                return cached[0]
+
+    result = validate(email, checkDNS, errorlevel, engine, non_ascii, decode)
+
+    if isinstance(parsedata, dict):
+        parsedata[ISEMAIL_COMPONENT_LOCALPART] = result.local_part
+        parsedata[ISEMAIL_COMPONENT_DOMAIN] = result.domain
+        if result.literal is not None:
+            parsedata[ISEMAIL_COMPONENT_LITERAL] = result.literal
+        parsedata['status'] = list(result.diagnoses)
+
+    if cache is not None:
+        cache.put(key, result.status, result.diagnoses, checkDNS)
+
+    return result.status
+
+def validate(email, checkDNS=False, errorlevel=False, engine='parser', non_ascii='octets', decode=True):
+    """
+    Check an email address as is_email() does, but return an EmailResult
+    holding the parsed components and every diagnosis as well as the status,
+    so callers that need the domain or local part don't have to parse the
+    address again.
+
+    :param email: The email address to check
+    :param checkDNS: As for is_email()
+    :param errorlevel: As for is_email(); it decides EmailResult.status
+    :param engine: As for is_email()
+    :param non_ascii: As for is_email()
+    :param decode: As for is_email()
+    """
+    threshold, diagnose = _threshold(errorlevel)
 
-        if int(errorlevel) == E_WARNING:
-            threshold = ISEMAIL_THRESHOLD
-        elif int(errorlevel) == E_ERROR:
-            threshold = ISEMAIL_VALID
-        else:
-            threshold = int(errorlevel)
+    # Parse the address into components, character by character
+    parsed = _parse(email, engine, non_ascii, decode)
+    return_status, components, element_count = parsed
 
-    return_status = [ISEMAIL_VALID]
+    # Check DNS?
+    verdict = None
+    if checkDNS and (return_status.worst < ISEMAIL_DNSWARN):
+        verdict = _check_dns(_dns_name(components, element_count))
+
+    return _result(email, parsed, verdict, threshold, diagnose)
+
+def is_email_many(emails, checkDNS=False, errorlevel=False, cache=None, engine='parser', non_ascii='octets', decode=True):
+    """
+    Check many email addresses, yielding (email, status, diagnoses) for each
+    one in the order they were given. status is what is_email() would have
+    returned for the same arguments and diagnoses is the tuple of codes that
+    is_email() puts in parsedata['status'].
+
+    The errorlevel is only interpreted once and, when checkDNS is set, each
+    distinct domain is only looked up once no matter how many addresses share
+    it.
+
+    :param emails: Any iterable of email addresses; it is consumed lazily
+    :param checkDNS: As for is_email()
+    :param errorlevel: As for is_email()
+    :param cache: An optional ResultCache, as for is_email()
+    :param engine: As for is_email()
+    :param non_ascii: As for is_email()
+    :param decode: As for is_email()
+    """
+    threshold, diagnose = _threshold(errorlevel)
+    dns_verdicts = {}  # DNS name -> verdict from _check_dns() for this batch
+
+    for email in emails:
+        if cache is not None:
+            key = cache.key(email, checkDNS, errorlevel, non_ascii, decode)
+            cached = cache.get(key)
+            hooks = instrumentation
+            if hooks is not None:
+                hooks.cache('result', cached is not None)
+            if cached is not None:
+                yield email, cached[0], cached[1]
+                continue
+
+        parsed = _parse(email, engine, non_ascii, decode)
+        return_status, components, element_count = parsed
+        verdict = None
+
+        if checkDNS and (return_status.worst < ISEMAIL_DNSWARN):
+            domain = _dns_name(components, element_count)
+            verdict = dns_verdicts.get(domain.lower())
+            if verdict is None:
+                verdict = dns_verdicts[domain.lower()] = _check_dns(domain)
+
+        result = _result(email, parsed, verdict, threshold, diagnose)
+
+        if cache is not None:
+            cache.put(key, result.status, result.diagnoses, checkDNS)
+
+        yield email, result.status, result.diagnoses
+
+def is_email_bulk(emails, errorlevel=False, concurrency=32, chunksize=10000, stats=None, progress=None, cache=None, engine='parser', non_ascii='octets', decode=True):
+    """
+    Check a large list of addresses, DNS included, yielding (email, status,
+    diagnoses) for each one in the order they were given, as
+    is_email_many(emails, True, errorlevel, ...) would.
+
+    Addresses are taken chunksize at a time. Each chunk is checked for syntax
+    first, then the domains in it that haven't been seen before are looked
+    up, concurrency at a time on a pool of threads, and their verdicts are
+    joined back to the addresses. Every distinct domain in the list is
+    looked up exactly once, so the DNS work grows with the number of domains
+    rather than the number of addresses. Memory use grows with the number
+    of domains too, but not with the number of addresses.
+
+    :param emails: Any iterable of email addresses; it is consumed lazily
+    :param errorlevel: As for is_email()
+    :param concurrency: The most domains to look up at once. With the
+                        'concurrent' strategy, each of them makes its queries
+                        at once, on a shared pool that is enlarged to match.
+    :param chunksize: The number of addresses to check for syntax before looking up their domains
+    :param stats: If passed a dict, it is kept up to date with the number of
+                  'addresses' checked, how many needed a DNS check
+                  ('dns_addresses'), the distinct 'domains' looked up, the
+                  total 'seconds' and the 'dns_seconds' spent on lookups,
+                  and 'addresses_per_second' and 'domains_per_second'
+    :param progress: Called with the stats dict after each chunk
+    :param cache: An optional ResultCache, as for is_email()
+    :param engine: As for is_email()
+    :param non_ascii: As for is_email()
+    :param decode: As for is_email()
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    threshold, diagnose = _threshold(errorlevel)
+    emails = iter(emails)
+    dns_verdicts = {}  # DNS name -> verdict from _check_dns(), for the whole list
+    if stats is None:
+        stats = {}
+    stats.update(addresses=0, dns_addresses=0, domains=0, seconds=0.0, dns_seconds=0.0, addresses_per_second=0.0, domains_per_second=0.0)
+    start = time.perf_counter()
+    if resolver_config.strategy == 'concurrent':
+        _dns_executor(len(_CONCURRENT_RDTYPES) * concurrency)
+
+    with ThreadPoolExecutor(concurrency, thread_name_prefix='is_email-bulk') as executor:
+        while True:
+            chunk = []  # (email, parsed, DNS name, cache key, cached result)
+            new_domains = {}  # DNS name -> domain, for domains first seen in this chunk
+            for email in islice(emails, chunksize):
+                cache_key = None
+                if cache is not None:
+                    cache_key = cache.key(email, True, errorlevel, non_ascii, decode)
+                    cached = cache.get(cache_key)
+                    hooks = instrumentation
+                    if hooks is not None:
+                        hooks.cache('result', cached is not None)
+                    if cached is not None:
+                        chunk.append((email, None, None, cache_key, cached))
+                        continue
+
+                parsed = _parse(email, engine, non_ascii, decode)
+                return_status, components, element_count = parsed
+                key = None
+                if return_status.worst < ISEMAIL_DNSWARN:
+                    domain = _dns_name(components, element_count)
+                    key = domain.lower()
+                    if key not in dns_verdicts:
+                        new_domains.setdefault(key, domain)
+                chunk.append((email, parsed, key, cache_key, None))
+            if not chunk:
+                break
+
+            dns_start = time.perf_counter()
+            for key, verdict in zip(new_domains, executor.map(_check_dns, new_domains.values())):
+                dns_verdicts[key] = verdict
+            stats['dns_seconds'] += time.perf_counter() - dns_start
+
+            for email, parsed, key, cache_key, cached in chunk:
+                if cached is not None:
+                    yield email, cached[0], cached[1]
+                    continue
+                result = _result(email, parsed, None if key is None else dns_verdicts[key], threshold, diagnose)
+                if cache is not None:
+                    cache.put(cache_key, result.status, result.diagnoses, True)
+                yield email, result.status, result.diagnoses
+
+            stats['addresses'] += len(chunk)
+            stats['dns_addresses'] += sum(key is not None for _, _, key, _, _ in chunk)
+            stats['domains'] = len(dns_verdicts)
+            stats['seconds'] = time.perf_counter() - start
+            stats['addresses_per_second'] = stats['addresses'] / stats['seconds'] if stats['seconds'] else 0.0
+            stats['domains_per_second'] = stats['domains'] / stats['dns_seconds'] if stats['dns_seconds'] else 0.0
+            if progress is not None:
+                progress(stats)
+
+def validate_parallel(emails, checkDNS=False, errorlevel=False, workers=None, chunksize=1000, stats=None):
+    """
+    Check addresses across a pool of worker processes, yielding
+    (email, status) in the order the addresses were given, where status is
+    what is_email() would have returned.
+
+    The input is read lazily, chunksize addresses at a time, and only a few
+    chunks per worker are in flight at once, so memory use doesn't grow with
+    the size of the input. Workers send back one byte per address rather than
+    the parsed components.
+
+    :param emails: Any iterable of email addresses
+    :param workers: The number of worker processes; defaults to os.cpu_count()
+    :param chunksize: The number of addresses sent to a worker at a time
+    :param stats: If passed a dict, it is filled with each worker's throughput
+                  as {pid: {'addresses': n, 'seconds': s, 'per_second': r}}
+    """
+    _, diagnose = _threshold(errorlevel)
+    workers = workers or os.cpu_count() or 1
+    emails = iter(emails)
+    pending = deque()
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Workers check DNS as the parent would, even if they aren't forked
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(domain_store, resolver_config, dns_cache)) as executor:
+        def submit():
+            chunk = list(islice(emails, chunksize))
+            if chunk:
+                pending.append((chunk, executor.submit(_validate_chunk, chunk, checkDNS, errorlevel)))
+            return bool(chunk)
+
+        while len(pending) < 2 * workers and submit():
+            pass
+
+        while pending:
+            chunk, future = pending.popleft()
+            pid, seconds, statuses = future.result()
+            submit()
+
+            if stats is not None:
+                worker = stats.setdefault(pid, {'addresses': 0, 'seconds': 0.0, 'per_second': 0.0})
+                worker['addresses'] += len(statuses)
+                worker['seconds'] += seconds
+                if worker['seconds']:
+                    worker['per_second'] = worker['addresses'] / worker['seconds']
+
+            for email, status in zip(chunk, statuses):
+                yield email, (status if diagnose else bool(status))
+
+def _set_domain_store(store):
+    global domain_store
+    domain_store = store
+
+def _init_worker(store, config, cache):
+    """
+    Set up a validate_parallel() worker with the parent's domain_store,
+    resolver_config and dns_cache settings
+    """
+    global resolver_config, dns_cache
+    _set_domain_store(store)
+    resolver_config = config
+    dns_cache = cache
+
+def _validate_chunk(emails, checkDNS, errorlevel):
+    """Worker side of validate_parallel(): (pid, seconds, statuses) for a chunk"""
+    start = time.perf_counter()
+    statuses = array('B', (status for _, status, _ in is_email_many(emails, checkDNS, errorlevel)))
+    return os.getpid(), time.perf_counter() - start, statuses
+
+async def is_email_async(email, checkDNS=False, errorlevel=False, cache=None, engine='parser', non_ascii='octets', decode=True):
+    """
+    is_email() for asyncio applications. The DNS lookups are made with
+    dnspython's asynchronous resolver so they don't block the event loop.
+    The other arguments are as for is_email().
+    """
+    key = None
+    if cache is not None:
+        key = cache.key(email, checkDNS, errorlevel, non_ascii, decode)
+        cached = cache.get(key)
+        hooks = instrumentation
+        if hooks is not None:
+            hooks.cache('result', cached is not None)
+        if cached is not None:
+            return cached[0]
+
+    threshold, diagnose = _threshold(errorlevel)
+    parsed = _parse(email, engine, non_ascii, decode)
+    return_status, components, element_count = parsed
+    verdict = None
+
+    if checkDNS and (return_status.worst < ISEMAIL_DNSWARN):
+        verdict = await _check_dns_async(_dns_name(components, element_count))
+
+    result = _result(email, parsed, verdict, threshold, diagnose)
+
+    if cache is not None:
+        cache.put(key, result.status, result.diagnoses, checkDNS)
+
+    return result.status
+
+async def is_email_many_async(emails, checkDNS=False, errorlevel=False, concurrency=100, cache=None, engine='parser', non_ascii='octets', decode=True):
+    """
+    is_email_many() for asyncio applications: an async generator of
+    (email, status, diagnoses) in the order the addresses were given.
+
+    Syntax checking happens as addresses are read. The DNS checks for the
+    addresses that need them run concurrently, at most concurrency at a time,
+    and each distinct domain is only looked up once: later addresses at a
+    domain wait for the lookup already in flight.
+
+    :param emails: An iterable or async iterable of email addresses
+    :param concurrency: The most domains to look up at once
+    :param cache: An optional ResultCache, as for is_email()
+    :param engine: As for is_email()
+    :param non_ascii: As for is_email()
+    :param decode: As for is_email()
+    """
+    import asyncio
+
+    threshold, diagnose = _threshold(errorlevel)
+    semaphore = asyncio.Semaphore(concurrency)
+    dns_verdicts = {}  # DNS name -> task resolving to a verdict from _check_dns_async()
+    pending = deque()  # Addresses checked for syntax but not yet yielded
+
+    async def check_dns(domain):
+        async with semaphore:
+            return await _check_dns_async(domain)
+
+    async def finish(email, parsed, verdict, cache_key, cached):
+        if cached is not None:
+            return email, cached[0], cached[1]
+        if verdict is not None:
+            verdict = await verdict
+        result = _result(email, parsed, verdict, threshold, diagnose)
+        if cache is not None:
+            cache.put(cache_key, result.status, result.diagnoses, checkDNS)
+        return email, result.status, result.diagnoses
+
+    try:
+        async for email in _aiter(emails):
+            cache_key = cached = None
+            if cache is not None:
+                cache_key = cache.key(email, checkDNS, errorlevel, non_ascii, decode)
+                cached = cache.get(cache_key)
+                hooks = instrumentation
+                if hooks is not None:
+                    hooks.cache('result', cached is not None)
+
+            if cached is not None:
+                pending.append((email, None, None, cache_key, cached))
+            else:
+                parsed = _parse(email, engine, non_ascii, decode)
+                return_status, components, element_count = parsed
+                verdict = None
+
+                if checkDNS and (return_status.worst < ISEMAIL_DNSWARN):
+                    domain = _dns_name(components, element_count)
+                    key = domain.lower()
+                    verdict = dns_verdicts.get(key)
+                    if verdict is None:
+                        verdict = dns_verdicts[key] = asyncio.ensure_future(check_dns(domain))
+
+                pending.append((email, parsed, verdict, cache_key, None))
+
+            # Keep enough addresses in hand to keep the resolver busy, but no more
+            while len(pending) > 2 * concurrency:
+                yield await finish(*pending.popleft())
+
+        while pending:
+            yield await finish(*pending.popleft())
+    finally:
+        for verdict in dns_verdicts.values():
+            verdict.cancel()
+
+async def _aiter(iterable):
+    """Iterate over either an iterable or an async iterable"""
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
 
-    # Parse the address into components, character by character
-    email = decode_email(email)
+def _threshold(errorlevel):
+    """Interpret is_email()'s errorlevel argument as (threshold, diagnose)"""
+    if (is_bool(errorlevel)):
+        return ISEMAIL_VALID, bool(errorlevel)
+
+    if int(errorlevel) == E_WARNING:
+        return ISEMAIL_THRESHOLD, True
+    elif int(errorlevel) == E_ERROR:
+        return ISEMAIL_VALID, True
+    else:
+        return int(errorlevel), True
+
+def _parse(email, engine='parser', non_ascii='octets', decode=True):
+    """
+    Decode an address with _text() and parse it, applying the final length
+    tests.
+
+    Returns (return_status, components, element_count) where components is
+    a _Components and element_count is the index of the last domain element.
+
+    Inputs longer than ISEMAIL_MAX_INPUT_LENGTH are diagnosed by
+    _parse_oversized() instead, without being decoded or parsed.
+    """
+    if engine not in ('parser', 'dfa'):
+        raise ValueError(f"engine must be 'parser' or 'dfa', not {engine!r}")
+    # The phases are only timed if there is instrumentation to report them to
+    hooks = instrumentation
+    if hooks is not None:
+        start = time.perf_counter()
+    if len(email) > ISEMAIL_MAX_INPUT_LENGTH:
+        parsed = _parse_oversized(email)
+        if hooks is not None:
+            hooks.phase('parse', time.perf_counter() - start)
+        return parsed
+
+    email = _text(email, non_ascii, decode)
+    if hooks is not None:
+        decoded = time.perf_counter()
+        hooks.phase('decode', decoded - start)
+
+    if engine == 'dfa':
+        parsed = _parse_fast(email) or _parse_dfa(email) or _parse_literal(email) or _parse_full(email)
+    else:
+        parsed = _parse_fast(email) or _parse_literal(email) or _parse_full(email)
+
+    if hooks is not None:
+        hooks.phase('parse', time.perf_counter() - decoded)
+    return parsed
+
+def _parse_oversized(email):
+    """
+    _parse() for an input longer than ISEMAIL_MAX_INPUT_LENGTH, which is
+    only scanned at C speed, never parsed. Two shapes get the diagnoses that
+    _parse_full() would give them, since nothing else could be wrong with
+    them: a dot-atom without "@" gets ISEMAIL_ERR_NODOMAIN, and a dot-atom at
+    a domain of LDH labels gets the final length diagnoses. Anything else
+    gets ISEMAIL_ERR_INPUT_TOOLONG, as its exact diagnosis would take a
+    full parse.
+    """
+    if not isinstance(email, str):
+        email = bytes(email)
+        # An ASCII address reads the same under every non_ascii policy
+        email = str(email, 'ascii') if email.isascii() else ''
+
+    return_status = DiagnosisSet()
+    at = email.find(ISEMAIL_STRING_AT)
+    local_part = email if at == -1 else email[:at]
+    domain = email[at + 1:]
+    dot_atom = (
+        local_part != '' and _OVERSIZED_LOCAL.fullmatch(local_part) is not None
+        and local_part[0] != '.' and '..' not in local_part
+    )
+
+    if dot_atom and at == -1:
+        # Even with a dot at the end, the parser reaches the end of the input
+        # still looking for the "@"
+        return_status.add(ISEMAIL_ERR_NODOMAIN)
+    elif (dot_atom and at != -1 and local_part[-1] != '.'
+            and domain != '' and _OVERSIZED_DOMAIN.fullmatch(domain) is not None
+            and domain[0] not in '.-' and domain[-1] not in '.-'
+            and '..' not in domain and '.-' not in domain and '-.' not in domain):
+        if at > 64:
+            return_status.add(ISEMAIL_RFC5322_LOCAL_TOOLONG)
+        element_count = _check_lengths(return_status, email, at)
+        return return_status, _Components(email, [0, at], [at + 1, len(email)]), element_count
+    else:
+        return_status.add(ISEMAIL_ERR_INPUT_TOOLONG)
+    return return_status, _Components('', [], []), 0
+
+def _parse_fast(email):
+    """
+    Recognise the plain dot-atom@sub.domain shape that makes up nearly all
+    real traffic without running the full parser. The pattern only accepts
+    addresses that the full parser would find no fault with at all, so
+    anything else (quotes, comments, FWS, literals, non-LDH domains, or an
+    address near a length limit) returns None and is parsed in full.
+    """
+    if len(email) > 254 or _FAST_PATH.fullmatch(email) is None:
+        return None
+
+    at = email.index(ISEMAIL_STRING_AT)
+    components = _Components(email, [0, at], [at + 1, len(email)])
+    return DiagnosisSet(), components, email.count(ISEMAIL_STRING_DOT, at)
+
+def _parse_literal(email):
+    """
+    Like _parse_fast(), for a dot-atom local part at a domain literal of
+    dtext short enough that no length limit applies. The parser would only
+    ever find fault with the literal itself, so the address needs no more
+    than _check_address_literal(). Anything else returns None.
+    """
+    if len(email) > 254 or _LITERAL_PATH.fullmatch(email) is None:
+        return None
+
+    at = email.index(ISEMAIL_STRING_AT)
+    components = _Components(email, [0, at], [at + 1, len(email)])
+    components.literal_spans = [at + 2, len(email) - 1]
+    components.domain_dots = []
+    return_status = DiagnosisSet()
+    for code in _check_address_literal(email[at + 2:-1]):
+        return_status.add(code)
+    return return_status, components, 0
+
+# The DFA engine. Nested comments aren't a regular language and the CFWS
+# diagnoses depend on where the parser has been, so the DFA only decides
+# addresses made of dot-atoms and quoted strings at a dot-atom domain: the
+# states and, for each class of character, the state it leads to. Any
+# transition not listed, or ending anywhere but in a label, leaves the
+# address to the full parser.
+_DFA_ATEXT = ('letdig', 'hyphen', 'atext')
+_DFA_VCHAR = _DFA_ATEXT + ('dot', 'at', 'dquote', 'backslash', 'qtext')
+_DFA_GRAMMAR = {
+    'element': {**dict.fromkeys(_DFA_ATEXT, 'atom'), 'dquote': 'quoted_string'},
+    'atom': {**dict.fromkeys(_DFA_ATEXT, 'atom'), 'dot': 'element', 'at': 'label_start'},
+    'quoted_string': {
+        **dict.fromkeys(_DFA_ATEXT + ('dot', 'at', 'qtext', 'sp', 'obs'), 'quoted_string'),
+        'backslash': 'quoted_pair',
+        'dquote': 'quoted',
+    },
+    'quoted_pair': dict.fromkeys(_DFA_VCHAR + ('sp', 'htab'), 'quoted_string'),
+    'quoted': {'dot': 'element', 'at': 'label_start'},
+    'label_start': dict.fromkeys(('letdig', 'atext'), 'label'),
+    'label': {**dict.fromkeys(('letdig', 'atext'), 'label'), 'hyphen': 'hyphen', 'dot': 'label_start'},
+    'hyphen': {**dict.fromkeys(('letdig', 'atext'), 'label'), 'hyphen': 'hyphen'},
+}
+_DFA_CLASSES = ('letdig', 'hyphen', 'atext', 'dot', 'at', 'dquote', 'backslash', 'qtext', 'sp', 'htab', 'obs', 'other')
+
+def _compile_dfa():
+    """
+    Build the DFA's tables: a bytes.translate() table from each octet to its
+    class, and a flat transition table indexed by state + class in which
+    states are numbered in steps of the number of classes and -1 means the
+    DFA can't decide the address
+    """
+    named = {
+        ISEMAIL_STRING_DOT: 'dot', ISEMAIL_STRING_AT: 'at', ISEMAIL_STRING_DQUOTE: 'dquote',
+        ISEMAIL_STRING_BACKSLASH: 'backslash', ISEMAIL_STRING_SP: 'sp', ISEMAIL_STRING_HTAB: 'htab',
+    }
+
+    def char_class(code):
+        char = chr(code)
+        flags = _CHAR_CLASSES[code] if code < 128 else 0
+        if flags & _LET_DIG:
+            return 'letdig'
+        if char == ISEMAIL_STRING_HYPHEN:
+            return 'hyphen'
+        if flags & _ATEXT:
+            return 'atext'
+        if char in named:
+            return named[char]
+        if flags & _QTEXT:
+            return 'qtext'
+        if flags & _OBS_NO_WS_CTL:
+            return 'obs'
+        return 'other'
+
+    width = len(_DFA_CLASSES)
+    states = list(_DFA_GRAMMAR)
+    table = [-1] * (len(states) * width)
+    for state, transitions in enumerate(_DFA_GRAMMAR.values()):
+        for char_class_name, target in transitions.items():
+            table[state * width + _DFA_CLASSES.index(char_class_name)] = states.index(target) * width
+
+    classes = bytes(_DFA_CLASSES.index(char_class(code)) for code in range(256))
+    return classes, table, states.index('label') * width
+
+_DFA_CHAR_CLASSES, _DFA_TABLE, _DFA_ACCEPT = _compile_dfa()
+_DFA_LOCAL_DOT = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|(\.)', re.S)  # Dots between the elements of a local part
+_DFA_OBS_QTEXT = re.compile(r'[\x01-\x08\x0b\x0c\x0e-\x1f\x7f]')
+_DFA_NON_LDH = re.compile('[^A-Za-z0-9.-]')
+
+def _parse_dfa(email):
+    """
+    Parse an address with the DFA engine, or return None if it is outside
+    what the DFA decides. The DFA only accepts addresses with no errors, so
+    the diagnoses follow from the shape it has accepted.
+    """
+    if not email.isascii():
+        return None
+
+    table = _DFA_TABLE
+    state = 0
+    for char_class in email.encode('ascii').translate(_DFA_CHAR_CLASSES):
+        state = table[state + char_class]
+        if state < 0:
+            return None
+    if state != _DFA_ACCEPT:
+        return None
+
+    return_status = DiagnosisSet()
+    at = email.rindex(ISEMAIL_STRING_AT)  # Domains accepted by the DFA have no "@"
+    local_part = email[:at]
+    domain = email[at + 1:]
+    components = _Components(email, [0, at], [at + 1, len(email)])
+
+    if ISEMAIL_STRING_DQUOTE in local_part:
+        components.local_dots = [match.start(1) for match in _DFA_LOCAL_DOT.finditer(local_part) if match.start(1) != -1]
+        if local_part[0] == ISEMAIL_STRING_DQUOTE:
+            return_status.add(ISEMAIL_RFC5321_QUOTEDSTRING)
+        if components.local_dots:
+            return_status.add(ISEMAIL_DEPREC_LOCALPART)  # A quoted string that isn't the whole local part
+        if _DFA_OBS_QTEXT.search(local_part):
+            return_status.add(ISEMAIL_DEPREC_QTEXT)  # Control characters only get this far inside a quoted string
+
+    if at > 64:
+        return_status.add(ISEMAIL_RFC5322_LOCAL_TOOLONG)
+    if _DFA_NON_LDH.search(domain):
+        return_status.add(ISEMAIL_RFC5322_DOMAIN)
+
+    return return_status, components, _check_lengths(return_status, email, at)
+
+def _check_lengths(return_status, email, at):
+    """
+    The label and overall length tests of _parse_full() for an address whose
+    domain, after the "@" at at, is plain dot-separated labels. Returns the
+    index of the last domain element.
+    """
+    domain = email[at + 1:]
+    labels = domain.split(ISEMAIL_STRING_DOT)
+    for label in labels[:-1]:
+        if len(label) > 63:
+            return_status.add(ISEMAIL_RFC5322_LABEL_TOOLONG)
+    # As at the end of _parse_full(), only the first of these applies
+    if len(domain) > 255:
+        return_status.add(ISEMAIL_RFC5322_DOMAIN_TOOLONG)
+    elif len(email) > 254:
+        return_status.add(ISEMAIL_RFC5322_TOOLONG)
+    elif len(labels[-1]) > 63:
+        return_status.add(ISEMAIL_RFC5322_LABEL_TOOLONG)
+    return len(labels) - 1
+
+def _parse_full(email):
+    """The character by character parser behind _parse()"""
+    return_status = DiagnosisSet()
     raw_length = len(email)
     context = ISEMAIL_COMPONENT_LOCALPART  # Where we are
     context_stack = [context]  # Where we have been
     context_prior = ISEMAIL_COMPONENT_LOCALPART  # Where we just came from
     token = ''  # The current character
     token_prior = ''  # The previous character
-    parsedata = {
-        ISEMAIL_COMPONENT_LOCALPART: '',
-        ISEMAIL_COMPONENT_DOMAIN: ''
-    }  # For the components of the address
-
-    atomlist = {
-        ISEMAIL_COMPONENT_LOCALPART: [''],
-        ISEMAIL_COMPONENT_DOMAIN: ['']
-    }  # For the dot-atom elements of the address
+    components = _Components(email, [], [])  # Where the components of the address are
+    local_spans = components.local_spans
+    domain_spans = components.domain_spans
+    local_dots = components.local_dots = []  # Where the dot-atom elements of the address are separated
+    domain_dots = components.domain_dots = []
+    local_len = domain_len = 0  # Lengths of the components so far
     element_count = 0
     element_len = 0
     wsp_before = wsp_after = False  # Whitespace before and after the current character
     hyphen_flag = False  # Hyphen cannot occur at the end of a subdomain
     end_or_die = False  # CFWS can only appear at the end of the element
+    fws_count = 0  # Number of CRLF folds seen so far
 
     i = 0
     while i < raw_length:
         token = email[i]
+        ord_t = ord(token)
+        flags = _CHAR_CLASSES[ord_t] if ord_t < 128 else 0
 
         if context == ISEMAIL_COMPONENT_LOCALPART:
             # https://tools.ietf.org/html/rfc5322#section-3.4.1
@@ -313,12 +1910,45 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
             #   word            =   atom / quoted-string
             #
             #   atom            =   [CFWS] 1*atext [CFWS]
-            if token == ISEMAIL_STRING_OPENPARENTHESIS:
+            # Anything without a case of its own below is atext, or not valid here
+            # https://tools.ietf.org/html/rfc5322#section-3.2.3
+            #    atext           =   ALPHA / DIGIT /    ; Printable US-ASCII
+            #                        "!" / "#" /        ;  characters not including
+            #                        "$" / "%" /        ;  specials.  Used for atoms.
+            #                        "&" / "'" /
+            #                        "*" / "+" /
+            #                        "-" / "/" /
+            #                        "=" / "?" /
+            #                        "^" / "_" /
+            #                        "`" / "{" /
+            #                        "|" / "}" /
+            #                        "~"
+            if not flags & _LOCALPART_DELIMITER:
+                if (end_or_die):
+                    # We have encountered atext where it is no longer valid
+                    if context_prior in [ISEMAIL_CONTEXT_COMMENT, ISEMAIL_CONTEXT_FWS]:
+                        return_status.add(ISEMAIL_ERR_ATEXT_AFTER_CFWS)
+                    elif context_prior == ISEMAIL_CONTEXT_QUOTEDSTRING:
+                        return_status.add(ISEMAIL_ERR_ATEXT_AFTER_QS)
+                    else:
+                        raise Exception(f"More atext found where none is allowed, but unrecognised prior context: {context_prior}")
+                else:
+                    context_prior = context
+
+                    if not flags & _ATEXT:
+                        return_status.add(ISEMAIL_ERR_EXPECTING_ATEXT) # Fatal error
+                        #break
+
+                    _extend(local_spans, i, i + 1)
+                    local_len += 1
+                    element_len += 1
+
+            elif token == ISEMAIL_STRING_OPENPARENTHESIS:
                 if element_len == 0:
                     # Comments are OK at the beginning of an element
-                    return_status.append(ISEMAIL_CFWS_COMMENT if element_count == 0 else ISEMAIL_DEPREC_COMMENT)
+                    return_status.add(ISEMAIL_CFWS_COMMENT if element_count == 0 else ISEMAIL_DEPREC_COMMENT)
                 else:
-                    return_status.append(ISEMAIL_CFWS_COMMENT)
+                    return_status.add(ISEMAIL_CFWS_COMMENT)
                     end_or_die = True  # We can't start a comment in the middle of an element, so this better be the end
 
                 context_stack.append(context)
@@ -327,43 +1957,42 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
             elif token == ISEMAIL_STRING_DOT:
                 if element_len == 0:
                     # Another dot, already?
-                    return_status.append(ISEMAIL_ERR_DOT_START if element_count == 0 else ISEMAIL_ERR_CONSECUTIVEDOTS)
+                    return_status.add(ISEMAIL_ERR_DOT_START if element_count == 0 else ISEMAIL_ERR_CONSECUTIVEDOTS)
                 else:
                     # The entire local-part can be a quoted string for RFC 5321
                     # If it's just one atom that is quoted then it's an RFC 5322 obsolete form
                     if end_or_die:
-                        return_status.append(ISEMAIL_DEPREC_LOCALPART)
+                        return_status.add(ISEMAIL_DEPREC_LOCALPART)
 
                     end_or_die = False  # CFWS & quoted strings are OK again now we're at the beginning of an element (although they are obsolete forms)
                     element_len = 0
                     element_count += 1
-                    parsedata[ISEMAIL_COMPONENT_LOCALPART] += token
-                    while len(atomlist[ISEMAIL_COMPONENT_LOCALPART]) <= element_count:
-                        atomlist[ISEMAIL_COMPONENT_LOCALPART].append('')
-                    atomlist[ISEMAIL_COMPONENT_LOCALPART][element_count] = ''
+                    local_dots.append(local_len)
+                    _extend(local_spans, i, i + 1)
+                    local_len += 1
 
             elif token == ISEMAIL_STRING_DQUOTE:
                 if element_len == 0:
                     # The entire local-part can be a quoted string for RFC 5321
                     # If it's just one atom that is quoted then it's an RFC 5322 obsolete form
-                    return_status.append(ISEMAIL_RFC5321_QUOTEDSTRING if element_count == 0 else ISEMAIL_DEPREC_LOCALPART)
+                    return_status.add(ISEMAIL_RFC5321_QUOTEDSTRING if element_count == 0 else ISEMAIL_DEPREC_LOCALPART)
 
-                    parsedata[ISEMAIL_COMPONENT_LOCALPART] += token
-                    atomlist[ISEMAIL_COMPONENT_LOCALPART][element_count] += token
+                    _extend(local_spans, i, i + 1)
+                    local_len += 1
                     element_len += 1
                     end_or_die = True  # Quoted string must be the entire element
                     context_stack.append(context)
                     context = ISEMAIL_CONTEXT_QUOTEDSTRING
                 else:
-                    return_status.append(ISEMAIL_ERR_EXPECTING_ATEXT)
+                    return_status.add(ISEMAIL_ERR_EXPECTING_ATEXT)
 
             elif token in [ISEMAIL_STRING_CR, ISEMAIL_STRING_SP, ISEMAIL_STRING_HTAB]:
                 if ((token == ISEMAIL_STRING_CR) and ((i+1 == raw_length) or (email[i+1] != ISEMAIL_STRING_LF))):
-                    return_status.append(ISEMAIL_ERR_CR_NO_LF)
+                    return_status.add(ISEMAIL_ERR_CR_NO_LF)
                     break
 
                 if element_len == 0:
-                    return_status.append(ISEMAIL_CFWS_FWS if element_count == 0 else ISEMAIL_DEPREC_FWS)
+                    return_status.add(ISEMAIL_CFWS_FWS if element_count == 0 else ISEMAIL_DEPREC_FWS)
                 else:
                     end_or_die = True  # We can't start FWS in the middle of an element, so this better be the end
 
@@ -376,15 +2005,15 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
                 if len(context_stack) != 1:
                     raise Exception('Unexpected item on context stack')
 
-                if parsedata[ISEMAIL_COMPONENT_LOCALPART] == '':
-                    return_status.append(ISEMAIL_ERR_NOLOCALPART)  # Fatal error
+                if local_len == 0:
+                    return_status.add(ISEMAIL_ERR_NOLOCALPART)  # Fatal error
                 elif element_len == 0:
-                    return_status.append(ISEMAIL_ERR_DOT_END)  # Fatal error
+                    return_status.add(ISEMAIL_ERR_DOT_END)  # Fatal error
 				# https://tools.ietf.org/html/rfc5321#section-4.5.3.1.1
 				#   The maximum total length of a user name or other local-part is 64
 				#   octets.
-                elif len(parsedata[ISEMAIL_COMPONENT_LOCALPART]) > 64:
-                    return_status.append(ISEMAIL_RFC5322_LOCAL_TOOLONG)
+                elif local_len > 64:
+                    return_status.add(ISEMAIL_RFC5322_LOCAL_TOOLONG)
 				# https://tools.ietf.org/html/rfc5322#section-3.4.1
 				#   Comments and folding white space
 				#   SHOULD NOT be used around the "@" in the addr-spec.
@@ -396,7 +2025,7 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
 				#    implications should be understood and the case carefully weighed
 				#    before implementing any behavior described with this label.
                 elif context_prior in [ISEMAIL_CONTEXT_COMMENT, ISEMAIL_CONTEXT_FWS]:
-                    return_status.append(ISEMAIL_DEPREC_CFWS_NEAR_AT)
+                    return_status.add(ISEMAIL_DEPREC_CFWS_NEAR_AT)
 
                 # Clear everything down for the domain parsing
                 context = ISEMAIL_COMPONENT_DOMAIN  # Where we are
@@ -405,40 +2034,6 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
                 element_len = 0
                 end_or_die = False  # CFWS can only appear at the end of the element
 
-            # default case
-            # https://tools.ietf.org/html/rfc5322#section-3.2.3
-            #    atext           =   ALPHA / DIGIT /    ; Printable US-ASCII
-            #                        "!" / "#" /        ;  characters not including
-            #                        "$" / "%" /        ;  specials.  Used for atoms.
-            #                        "&" / "'" /
-            #                        "*" / "+" /
-            #                        "-" / "/" /
-            #                        "=" / "?" /
-            #                        "^" / "_" /
-            #                        "`" / "{" /
-            #                        "|" / "}" /
-            #                        "~"
-            else:
-                if (end_or_die):
-                    # We have encountered atext where it is no longer valid
-                    if context_prior in [ISEMAIL_CONTEXT_COMMENT, ISEMAIL_CONTEXT_FWS]:
-                        return_status.append(ISEMAIL_ERR_ATEXT_AFTER_CFWS)
-                    elif context_prior == ISEMAIL_CONTEXT_QUOTEDSTRING:
-                        return_status.append(ISEMAIL_ERR_ATEXT_AFTER_QS)
-                    else:
-                        raise Exception(f"More atext found where none is allowed, but unrecognised prior context: {context_prior}")
-                else:
-                    context_prior = context
-                    ord_t = ord(token)
-
-                    if ((ord_t < 33) or (ord_t > 126) or (ord_t == 10) or (ISEMAIL_STRING_SPECIALS.find(token) != -1)):
-                        return_status.append(ISEMAIL_ERR_EXPECTING_ATEXT) # Fatal error
-                        #break
-
-                    parsedata[ISEMAIL_COMPONENT_LOCALPART] += token
-                    atomlist[ISEMAIL_COMPONENT_LOCALPART][element_count] += token
-                    element_len += 1
-
 		# -------------------------------------------------------------
 		#  Domain
 		# -------------------------------------------------------------
@@ -483,13 +2078,64 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
 			# have reached is this: "addressing information" must comply with
 			# RFC 5321 (and in turn RFC 1035), anything that is "semantically
 			# invisible" must comply only with RFC 5322.
-            if token == ISEMAIL_STRING_OPENPARENTHESIS:
+            # atext, or anything else without a case of its own below
+            if not flags & _DOMAIN_DELIMITER:
+				# RFC 5322 allows any atext...
+				# https://tools.ietf.org/html/rfc5322#section-3.2.3
+				#    atext           =   ALPHA / DIGIT /    ; Printable US-ASCII
+				#                        "!" / "#" /        ;  characters not including
+				#                        "$" / "%" /        ;  specials.  Used for atoms.
+				#                        "&" / "'" /
+				#                        "*" / "+" /
+				#                        "-" / "/" /
+				#                        "=" / "?" /
+				#                        "^" / "_" /
+				#                        "`" / "{" /
+				#                        "|" / "}" /
+				#                        "~"
+
+				# But RFC 5321 only allows letter-digit-hyphen to comply with DNS rules (RFCs 1034 & 1123)
+				# https://tools.ietf.org/html/rfc5321#section-4.1.2
+				#   sub-domain     = Let-dig [Ldh-str]
+				# 
+				#   Let-dig        = ALPHA / DIGIT
+				# 
+				#   Ldh-str        = *( ALPHA / DIGIT / "-" ) Let-dig
+				# 
+                if end_or_die:
+                    # We have encountered atext where it is no longer valid
+                    if context_prior in [ISEMAIL_CONTEXT_COMMENT, ISEMAIL_CONTEXT_FWS]:
+                        return_status.add(ISEMAIL_ERR_ATEXT_AFTER_CFWS)
+                    elif context_prior == ISEMAIL_COMPONENT_LITERAL:
+                        return_status.add(ISEMAIL_ERR_ATEXT_AFTER_DOMLIT)
+                    else:
+                        raise Exception(f"More atext found where none is allowed, but unrecognised prior context: {context_prior}")
+
+                hyphen_flag = False  # Assume this token isn't a hyphen unless we discover it is
+
+                if not flags & _ATEXT:
+                    return_status.add(ISEMAIL_ERR_EXPECTING_ATEXT)  # Fatal error
+                elif token == ISEMAIL_STRING_HYPHEN:
+                    if element_len == 0:
+                        # Hyphens can't be at the beginning of a subdomain
+                        return_status.add(ISEMAIL_ERR_DOMAINHYPHENSTART)  # Fatal error
+
+                    hyphen_flag = True
+                elif not flags & _LET_DIG:
+                    # Not an RFC 5321 subdomain, but still OK by RFC 5322
+                    return_status.add(ISEMAIL_RFC5322_DOMAIN)
+
+                _extend(domain_spans, i, i + 1)
+                domain_len += 1
+                element_len += 1
+
+            elif token == ISEMAIL_STRING_OPENPARENTHESIS:
                 if element_len == 0:
                     # Comments at the start of the domain are deprecated in the text
                     # Comments at the start of a subdomain are obs-domain
-                    return_status.append(ISEMAIL_DEPREC_CFWS_NEAR_AT if element_count == 0 else ISEMAIL_DEPREC_COMMENT)
+                    return_status.add(ISEMAIL_DEPREC_CFWS_NEAR_AT if element_count == 0 else ISEMAIL_DEPREC_COMMENT)
                 else:
-                    return_status.append(ISEMAIL_CFWS_COMMENT)
+                    return_status.add(ISEMAIL_CFWS_COMMENT)
                     end_or_die = True  # We can't start a comment in the middle of an element, so this better be the end
 
                 context_stack.append(context)
@@ -499,10 +2145,10 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
             elif token == ISEMAIL_STRING_DOT:
                 if element_len == 0:
                     # Another dot, already? Fatal error.
-                    return_status.append(ISEMAIL_ERR_DOT_START if element_count == 0 else ISEMAIL_ERR_CONSECUTIVEDOTS)
+                    return_status.add(ISEMAIL_ERR_DOT_START if element_count == 0 else ISEMAIL_ERR_CONSECUTIVEDOTS)
                 elif hyphen_flag:
                     # Previous subdomain ended in a hyphen. Fatal error.
-                    return_status.append(ISEMAIL_ERR_DOMAINHYPHENEND)
+                    return_status.add(ISEMAIL_ERR_DOMAINHYPHENEND)
                 else:
 					# Nowhere in RFC 5321 does it say explicitly that the
 					# domain part of a Mailbox must be a valid domain according
@@ -517,97 +2163,44 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
 					# https://tools.ietf.org/html/rfc1035#section-2.3.4
 					# labels          63 octets or less
                     if element_len > 63:
-                        return_status.append(ISEMAIL_RFC5322_LABEL_TOOLONG)
+                        return_status.add(ISEMAIL_RFC5322_LABEL_TOOLONG)
 
                     end_or_die = False # CFWS is OK again now we're at the beginning of an element (although it may be obsolete CFWS)
                     element_len = 0
                     element_count += 1
-                    while len(atomlist[ISEMAIL_COMPONENT_DOMAIN]) <= element_count:
-                        atomlist[ISEMAIL_COMPONENT_DOMAIN].append('')
-                    atomlist[ISEMAIL_COMPONENT_DOMAIN][element_count] = ''
-                    parsedata[ISEMAIL_COMPONENT_DOMAIN] += token
+                    domain_dots.append(domain_len)
+                    _extend(domain_spans, i, i + 1)
+                    domain_len += 1
 
             # Domain literal
             elif token == ISEMAIL_STRING_OPENSQBRACKET:
-                if parsedata[ISEMAIL_COMPONENT_DOMAIN] == '':
+                if domain_len == 0:
                     end_or_die = True # Domain literal must be the only component
                     element_len += 1
                     context_stack.append(context)
                     context = ISEMAIL_COMPONENT_LITERAL
-                    parsedata[ISEMAIL_COMPONENT_DOMAIN] += token
-                    atomlist[ISEMAIL_COMPONENT_DOMAIN][element_count] += token
-                    parsedata[ISEMAIL_COMPONENT_LITERAL] = ''
+                    _extend(domain_spans, i, i + 1)
+                    domain_len += 1
+                    components.literal_spans = []
                 else:
-                    return_status.append(ISEMAIL_ERR_EXPECTING_ATEXT) # Fatal error
+                    return_status.add(ISEMAIL_ERR_EXPECTING_ATEXT) # Fatal error
 
             # Folding White Space
             elif token in [ISEMAIL_STRING_CR, ISEMAIL_STRING_SP, ISEMAIL_STRING_HTAB]:
                 if (token == ISEMAIL_STRING_CR) and ((i+1 == raw_length) or (email[i+1] != ISEMAIL_STRING_LF)):
-                    return_status.append(ISEMAIL_ERR_CR_NO_LF) # Fatal error
+                    return_status.add(ISEMAIL_ERR_CR_NO_LF) # Fatal error
                     break
 
                 if element_len == 0:
-                    return_status.append(ISEMAIL_DEPREC_CFWS_NEAR_AT if element_count == 0 else ISEMAIL_DEPREC_FWS)
+                    return_status.add(ISEMAIL_DEPREC_CFWS_NEAR_AT if element_count == 0 else ISEMAIL_DEPREC_FWS)
                 else:
-                    return_status.append(ISEMAIL_CFWS_FWS)
+                    return_status.add(ISEMAIL_CFWS_FWS)
                     end_or_die = True  # We can't start FWS in the middle of an element, so this better be the end
 
                 context_stack.append(context)
                 context = ISEMAIL_CONTEXT_FWS
                 token_prior = token
 
-            # atext
-            else:
-				# RFC 5322 allows any atext...
-				# https://tools.ietf.org/html/rfc5322#section-3.2.3
-				#    atext           =   ALPHA / DIGIT /    ; Printable US-ASCII
-				#                        "!" / "#" /        ;  characters not including
-				#                        "$" / "%" /        ;  specials.  Used for atoms.
-				#                        "&" / "'" /
-				#                        "*" / "+" /
-				#                        "-" / "/" /
-				#                        "=" / "?" /
-				#                        "^" / "_" /
-				#                        "`" / "{" /
-				#                        "|" / "}" /
-				#                        "~"
-
-				# But RFC 5321 only allows letter-digit-hyphen to comply with DNS rules (RFCs 1034 & 1123)
-				# https://tools.ietf.org/html/rfc5321#section-4.1.2
-				#   sub-domain     = Let-dig [Ldh-str]
-				# 
-				#   Let-dig        = ALPHA / DIGIT
-				# 
-				#   Ldh-str        = *( ALPHA / DIGIT / "-" ) Let-dig
-				# 
-                if end_or_die:
-                    # We have encountered atext where it is no longer valid
-                    if context_prior in [ISEMAIL_CONTEXT_COMMENT, ISEMAIL_CONTEXT_FWS]:
-                        return_status.append(ISEMAIL_ERR_ATEXT_AFTER_CFWS)
-                    elif context_prior == ISEMAIL_COMPONENT_LITERAL:
-                        return_status.append(ISEMAIL_ERR_ATEXT_AFTER_DOMLIT)
-                    else:
-                        raise Exception(f"More atext found where none is allowed, but unrecognised prior context: {context_prior}")
-
-                ord_t = ord(token)
-                hyphen_flag = False  # Assume this token isn't a hyphen unless we discover it is
-
-                if ((ord_t < 33) or (ord_t > 126) or (ISEMAIL_STRING_SPECIALS.find(token) != -1)):
-                    return_status.append(ISEMAIL_ERR_EXPECTING_ATEXT)  # Fatal error
-                elif token == ISEMAIL_STRING_HYPHEN:
-                    if element_len == 0:
-                        # Hyphens can't be at the beginning of a subdomain
-                        return_status.append(ISEMAIL_ERR_DOMAINHYPHENSTART)  # Fatal error
-
-                    hyphen_flag = True
-                elif (not ((ord_t > 47 and ord_t < 58) or (ord_t > 64 and ord_t < 91) or (ord_t > 96 and ord_t < 123))):
-                    # Not an RFC 5321 subdomain, but still OK by RFC 5322
-                    return_status.append(ISEMAIL_RFC5322_DOMAIN)
-
-                parsedata[ISEMAIL_COMPONENT_DOMAIN] += token
-                atomlist[ISEMAIL_COMPONENT_DOMAIN][element_count] += token
-                element_len += 1
-
 		#-------------------------------------------------------------
 		# Domain literal
 		#-------------------------------------------------------------
@@ -620,158 +2213,63 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
             #                       obs-dtext          ;  "[", "]", or "\"
             #
             #   obs-dtext       =   obs-NO-WS-CTL / quoted-pair
-            if token == ISEMAIL_STRING_CLOSESQBRACKET: # End of domain literal
-                if max(return_status) < ISEMAIL_DEPREC:
-                    # Could be a valid RFC 5321 address literal, so let's check
+            # dtext, or anything else without a case of its own below
+            if not flags & _LITERAL_DELIMITER:
+				# https://tools.ietf.org/html/rfc5322#section-3.4.1
+				#   dtext           =   %d33-90 /          ; Printable US-ASCII
+				#                       %d94-126 /         ;  characters not including
+				#                       obs-dtext          ;  "[", "]", or "\"
+				#
+				#   obs-dtext       =   obs-NO-WS-CTL / quoted-pair
+				#
+				#   obs-NO-WS-CTL   =   %d1-8 /            ; US-ASCII control
+				#                       %d11 /             ;  characters that do not
+				#                       %d12 /             ;  include the carriage
+				#                       %d14-31 /          ;  return, line feed, and
+				#                       %d127              ;  white space characters
+                # CR, SP & HTAB have their own cases below. LF has always been
+                # let through as obs-dtext here although it isn't obs-NO-WS-CTL
+                if flags & _DTEXT:
+                    pass
+                elif flags & _OBS_NO_WS_CTL or token == ISEMAIL_STRING_LF:
+                    return_status.add(ISEMAIL_RFC5322_DOMLIT_OBSDTEXT)
+                else:
+                    return_status.add(ISEMAIL_ERR_EXPECTING_DTEXT)  # Fatal error
+                    break
 
-                    # https://tools.ietf.org/html/rfc5321#section-4.1.2
-                    #   address-literal  = "[" ( IPv4-address-literal /
-                    #                    IPv6-address-literal /
-                    #                    General-address-literal ) "]"
-                    #                    ; See Section 4.1.3
-                    #
-                    # https://tools.ietf.org/html/rfc5321#section-4.1.3
-                    #   IPv4-address-literal  = Snum 3("."  Snum)
-                    #
-                    #   IPv6-address-literal  = "IPv6:" IPv6-addr
-                    #
-                    #   General-address-literal  = Standardized-tag ":" 1*dcontent
-                    #
-                    #   Standardized-tag  = Ldh-str
-                    #                     ; Standardized-tag MUST be specified in a
-                    #                     ; Standards-Track RFC and registered with IANA
-                    #
-                    #   dcontent      = %d33-90 / ; Printable US-ASCII
-                    #                 %d94-126 ; excl. "[", "\", "]"
-                    #
-                    #   Snum          = 1*3DIGIT
-                    #                 ; representing a decimal integer
-                    #                 ; value in the range 0 through 255
-                    #
-                    #   IPv6-addr     = IPv6-full / IPv6-comp / IPv6v4-full / IPv6v4-comp
-                    #
-                    #   IPv6-hex      = 1*4HEXDIG
-                    #
-                    #   IPv6-full     = IPv6-hex 7(":" IPv6-hex)
-                    #
-                    #   IPv6-comp     = [IPv6-hex *5(":" IPv6-hex)] "::"
-                    #                 [IPv6-hex *5(":" IPv6-hex)]
-                    #                 ; The "::" represents at least 2 16-bit groups of
-                    #                 ; zeros.  No more than 6 groups in addition to the
-                    #                 ; "::" may be present.
-                    #
-                    #   IPv6v4-full   = IPv6-hex 5(":" IPv6-hex) ":" IPv4-address-literal
-                    #
-                    #   IPv6v4-comp   = [IPv6-hex *3(":" IPv6-hex)] "::"
-                    #                 [IPv6-hex *3(":" IPv6-hex) ":"]
-                    #                 IPv4-address-literal
-                    #                 ; The "::" represents at least 2 16-bit groups of
-                    #                 ; zeros.  No more than 4 groups in addition to the
-                    #                 ; "::" and IPv4-address-literal may be present.
-                    #   
-                    max_groups = 8
-                    matchesIP = []
-                    index = -1
-                    addressliteral = parsedata[ISEMAIL_COMPONENT_LITERAL]
-
-                    # Extract IPv4 part from the end of the address-literal (if there is one)
-                    ipv4_pattern = r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$'
-                    matchesIP = re.findall(ipv4_pattern, addressliteral)
-                    if len(matchesIP) > 0:
-                        index = addressliteral.rfind(matchesIP[0])
-                        if index != 0:
-                            addressliteral = addressliteral[:index] + '0:0'  # Convert IPv4 part to IPv6 format for further testing
-
-                    if index == 0:
-                        # Nothing there except a valid IPv4 address, so...
-                        return_status.append(ISEMAIL_RFC5321_ADDRESSLITERAL)
-                    elif addressliteral.lower().startswith(ISEMAIL_STRING_IPV6TAG.lower()):
-                        IPv6 = addressliteral[5:]
-                        matchesIP = IPv6.split(ISEMAIL_STRING_COLON) # Revision 2.7: Daniel Marschall's new IPv6 testing strategy
-                        groupCount = len(matchesIP)
-                        index = IPv6.find(ISEMAIL_STRING_DOUBLECOLON)
-
-                        if index == -1:
-                            # We need exactly the right number of groups
-                            if groupCount != max_groups:
-                                return_status.append(ISEMAIL_RFC5322_IPV6_GRPCOUNT)
-                        else:
-                            if IPv6.rfind(ISEMAIL_STRING_DOUBLECOLON) != index:
-                                return_status.append(ISEMAIL_RFC5322_IPV6_2X2XCOLON)
-                            else:
-                                if (index == 0) or (index == len(IPv6) - 2):
-                                    max_groups += 1 # RFC 4291 allows :: at the start or end of an address with 7 other groups in addition
-
-                                if groupCount > max_groups:
-                                    return_status.append(ISEMAIL_RFC5322_IPV6_MAXGRPS)
-                                elif groupCount == max_groups:
-                                    return_status.append(ISEMAIL_RFC5321_IPV6DEPRECATED) # Eliding a single "::"
-
-                        # IPv6 testing strategy
-                        if len(IPv6) > 1:
-                            if IPv6.startswith(ISEMAIL_STRING_COLON) and not IPv6[1] == ISEMAIL_STRING_COLON:
-                                return_status.append(ISEMAIL_RFC5322_IPV6_COLONSTRT) # Address starts with a single colon
-                            elif IPv6.endswith(ISEMAIL_STRING_COLON) and not IPv6[-2] == ISEMAIL_STRING_COLON:
-                                return_status.append(ISEMAIL_RFC5322_IPV6_COLONEND) # Address ends with a single colon
-                        elif len(IPv6) == 1 and IPv6.startswith(ISEMAIL_STRING_COLON):
-                            return_status.append(ISEMAIL_RFC5322_IPV6_COLONSTRT) # Address starts with a single colon
-                        if len([group for group in matchesIP if not re.match(r'^[0-9A-Fa-f]{0,4}$', group)]) != 0:
-                            return_status.append(ISEMAIL_RFC5322_IPV6_BADCHAR) # Check for unmatched characters
-                        else:
-                            return_status.append(ISEMAIL_RFC5321_ADDRESSLITERAL)
-                    else:
-                        return_status.append(ISEMAIL_RFC5322_DOMAINLITERAL)
+                _extend(components.literal_spans, i, i + 1)
+                _extend(domain_spans, i, i + 1)
+                domain_len += 1
+                element_len += 1
 
-                parsedata[ISEMAIL_COMPONENT_DOMAIN] += token
-                atomlist[ISEMAIL_COMPONENT_DOMAIN][element_count] += token
+            elif token == ISEMAIL_STRING_CLOSESQBRACKET: # End of domain literal
+                if return_status.worst < ISEMAIL_DEPREC:
+                    # Could be a valid RFC 5321 address literal, so let's check
+                    for code in _check_address_literal(components.literal()):
+                        return_status.add(code)
+
+                _extend(domain_spans, i, i + 1)
+                domain_len += 1
                 element_len += 1
                 context_prior = context
                 context = context_stack.pop()
 
             elif token == ISEMAIL_STRING_BACKSLASH:
-                return_status.append(ISEMAIL_RFC5322_DOMLIT_OBSDTEXT)
+                return_status.add(ISEMAIL_RFC5322_DOMLIT_OBSDTEXT)
                 context_stack.append(context)
                 context = ISEMAIL_CONTEXT_QUOTEDPAIR
 
             # Folding White Space
             elif token in [ISEMAIL_STRING_CR, ISEMAIL_STRING_SP, ISEMAIL_STRING_HTAB]:
                 if token == ISEMAIL_STRING_CR and ((i+1 == raw_length) or (email[i+1] != ISEMAIL_STRING_LF)):
-                    return_status.append(ISEMAIL_ERR_CR_NO_LF) # Fatal error
+                    return_status.add(ISEMAIL_ERR_CR_NO_LF) # Fatal error
                     break
 
-                return_status.append(ISEMAIL_CFWS_FWS)
+                return_status.add(ISEMAIL_CFWS_FWS)
                 context_stack.append(context)
                 context = ISEMAIL_CONTEXT_FWS
                 token_prior = token
 
-            # dtext
-            else:
-				# https://tools.ietf.org/html/rfc5322#section-3.4.1
-				#   dtext           =   %d33-90 /          ; Printable US-ASCII
-				#                       %d94-126 /         ;  characters not including
-				#                       obs-dtext          ;  "[", "]", or "\"
-				#
-				#   obs-dtext       =   obs-NO-WS-CTL / quoted-pair
-				#
-				#   obs-NO-WS-CTL   =   %d1-8 /            ; US-ASCII control
-				#                       %d11 /             ;  characters that do not
-				#                       %d12 /             ;  include the carriage
-				#                       %d14-31 /          ;  return, line feed, and
-				#                       %d127              ;  white space characters
-                ord_t = ord(token)
-
-                # CR, LF, SP & HTAB have already been parsed above
-                if (ord_t > 127) or (ord_t == 0) or (token == ISEMAIL_STRING_OPENSQBRACKET):
-                    return_status.append(ISEMAIL_ERR_EXPECTING_DTEXT)  # Fatal error
-                    break
-                elif (ord_t < 33) or (ord_t == 127):
-                    return_status.append(ISEMAIL_RFC5322_DOMLIT_OBSDTEXT)
-
-                parsedata[ISEMAIL_COMPONENT_LITERAL] += token
-                parsedata[ISEMAIL_COMPONENT_DOMAIN] += token
-                atomlist[ISEMAIL_COMPONENT_DOMAIN][element_count] += token
-                element_len += 1
-
 		#-------------------------------------------------------------
 		# Quoted string
 		#-------------------------------------------------------------
@@ -782,7 +2280,33 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
 			#                       [CFWS]
 			#
 			#   qcontent        =   qtext / quoted-pair
-            if token == ISEMAIL_STRING_BACKSLASH:
+            # qtext, or anything else without a case of its own below
+            if not flags & _QUOTEDSTRING_DELIMITER:
+				# https://tools.ietf.org/html/rfc5322#section-3.2.4
+				#   qtext           =   %d33 /             ; Printable US-ASCII
+				#                       %d35-91 /          ;  characters not including
+				#                       %d93-126 /         ;  "\" or the quote character
+				#                       obs-qtext
+				#
+				#   obs-qtext       =   obs-NO-WS-CTL
+				#
+				#   obs-NO-WS-CTL   =   %d1-8 /            ; US-ASCII control
+				#                       %d11 /             ;  characters that do not
+				#                       %d12 /             ;  include the carriage
+				#                       %d14-31 /          ;  return, line feed, and
+				#                       %d127              ;  white space characters
+                if flags & _QTEXT:
+                    pass
+                elif flags & _OBS_NO_WS_CTL:
+                    return_status.add(ISEMAIL_DEPREC_QTEXT)
+                else:
+                    return_status.add(ISEMAIL_ERR_EXPECTING_QTEXT) # Fatal error
+
+                _extend(local_spans, i, i + 1)
+                local_len += 1
+                element_len += 1
+
+            elif token == ISEMAIL_STRING_BACKSLASH:
                 context_stack.append(context)
                 context = ISEMAIL_CONTEXT_QUOTEDPAIR
 
@@ -791,7 +2315,7 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
 			# It's only FWS if we include HTAB or CRLF
             elif token in [ISEMAIL_STRING_CR, ISEMAIL_STRING_HTAB]:
                 if token == ISEMAIL_STRING_CR and (i+1 == raw_length or email[i+1] != ISEMAIL_STRING_LF):
-                    return_status.append(ISEMAIL_ERR_CR_NO_LF) # Fatal error
+                    return_status.add(ISEMAIL_ERR_CR_NO_LF) # Fatal error
                     break
 
 				# https://tools.ietf.org/html/rfc5322#section-3.2.2
@@ -802,49 +2326,23 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
 				# https://tools.ietf.org/html/rfc5322#section-3.2.4
 				#   the CRLF in any FWS/CFWS that appears within the quoted-string [is]
 				#   semantically "invisible" and therefore not part of the quoted-string
-                parsedata[ISEMAIL_COMPONENT_LOCALPART] += ISEMAIL_STRING_SP
-                atomlist[ISEMAIL_COMPONENT_LOCALPART][element_count] += ISEMAIL_STRING_SP
+                local_spans += _SPACE
+                local_len += 1
                 element_len += 1
 
-                return_status.append(ISEMAIL_CFWS_FWS)
+                return_status.add(ISEMAIL_CFWS_FWS)
                 context_stack.append(context)
                 context = ISEMAIL_CONTEXT_FWS
                 token_prior = token
 
             # End of quoted string
             elif token == ISEMAIL_STRING_DQUOTE:
-                parsedata[ISEMAIL_COMPONENT_LOCALPART] += token
-                atomlist[ISEMAIL_COMPONENT_LOCALPART][element_count] += token
+                _extend(local_spans, i, i + 1)
+                local_len += 1
                 element_len += 1
                 context_prior = context
                 context = context_stack.pop()
 
-            # qtext
-            else:
-				# https://tools.ietf.org/html/rfc5322#section-3.2.4
-				#   qtext           =   %d33 /             ; Printable US-ASCII
-				#                       %d35-91 /          ;  characters not including
-				#                       %d93-126 /         ;  "\" or the quote character
-				#                       obs-qtext
-				#
-				#   obs-qtext       =   obs-NO-WS-CTL
-				#
-				#   obs-NO-WS-CTL   =   %d1-8 /            ; US-ASCII control
-				#                       %d11 /             ;  characters that do not
-				#                       %d12 /             ;  include the carriage
-				#                       %d14-31 /          ;  return, line feed, and
-				#                       %d127              ;  white space characters
-                ord_t = ord(token)
-
-                if (ord_t > 127) or (ord_t == 0) or (ord_t == 10):
-                    return_status.append(ISEMAIL_ERR_EXPECTING_QTEXT) # Fatal error
-                elif (ord_t < 32) or (ord_t == 127):
-                    return_status.append(ISEMAIL_DEPREC_QTEXT)
-
-                parsedata[ISEMAIL_COMPONENT_LOCALPART] += token
-                atomlist[ISEMAIL_COMPONENT_LOCALPART][element_count] += token
-                element_len += 1
-
 			# https://tools.ietf.org/html/rfc5322#section-3.4.1
 			#   If the
 			#   string can be represented as a dot-atom (that is, it contains no
@@ -874,9 +2372,9 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
             ord_t = ord(token)
 
             if ord_t > 127:
-                return_status.append(ISEMAIL_ERR_EXPECTING_QPAIR) # Fatal error
+                return_status.add(ISEMAIL_ERR_EXPECTING_QPAIR) # Fatal error
             elif (((ord_t < 31) and (ord_t != 9)) or (ord_t == 127)): # SP & HTAB are allowed
-                return_status.append(ISEMAIL_DEPREC_QP)
+                return_status.add(ISEMAIL_DEPREC_QP)
 
 			# At this point we know where this qpair occurred so
 			# we could check to see if the character actually
@@ -893,13 +2391,13 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
                 pass # do nothing; just get us out of this quoted pair
 
             elif context == ISEMAIL_CONTEXT_QUOTEDSTRING:
-                parsedata[ISEMAIL_COMPONENT_LOCALPART] += token
-                atomlist[ISEMAIL_COMPONENT_LOCALPART][element_count] += token
+                _extend(local_spans, i - 1, i + 1)
+                local_len += 2
                 element_len += 2 # The maximum sizes specified by RFC 5321 are octet counts, so we must include the backslash
 
             elif context == ISEMAIL_COMPONENT_LITERAL:
-                parsedata[ISEMAIL_COMPONENT_DOMAIN] += token
-                atomlist[ISEMAIL_COMPONENT_DOMAIN][element_count] += token
+                _extend(domain_spans, i - 1, i + 1)
+                domain_len += 2
                 element_len += 2  # The maximum sizes specified by RFC 5321 are octet counts, so we must include the backslash
             else:
                 raise Exception(f"Quoted pair logic invoked in an invalid context: {context}")
@@ -912,7 +2410,30 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
 			#   comment         =   "(" *([FWS] ccontent) [FWS] ")"
 			#
 			#   ccontent        =   ctext / quoted-pair / comment
-            if token == ISEMAIL_STRING_OPENPARENTHESIS: # Nested comment
+            # ctext, or anything else without a case of its own below
+            if not flags & _COMMENT_DELIMITER:
+				# https://tools.ietf.org/html/rfc5322#section-3.2.3
+				#   ctext           =   %d33-39 /          ; Printable US-ASCII
+				#                       %d42-91 /          ;  characters not including
+				#                       %d93-126 /         ;  "(", ")", or "\"
+				#                       obs-ctext
+				#
+				#   obs-ctext       =   obs-NO-WS-CTL
+				#
+				#   obs-NO-WS-CTL   =   %d1-8 /            ; US-ASCII control
+				#                       %d11 /             ;  characters that do not
+				#                       %d12 /             ;  include the carriage
+				#                       %d14-31 /          ;  return, line feed, and
+				#                       %d127              ;  white space characters
+                if flags & _CTEXT:
+                    pass
+                elif flags & _OBS_NO_WS_CTL:
+                    return_status.add(ISEMAIL_DEPREC_CTEXT)
+                else:
+                    return_status.add(ISEMAIL_ERR_EXPECTING_CTEXT) # Fatal error
+                    break
+
+            elif token == ISEMAIL_STRING_OPENPARENTHESIS: # Nested comment
                 # Nested comments are OK
                 context_stack.append(context)
                 context = ISEMAIL_CONTEXT_COMMENT
@@ -943,36 +2464,14 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
             # Folding White Space
             elif token in [ISEMAIL_STRING_CR, ISEMAIL_STRING_SP, ISEMAIL_STRING_HTAB]:
                 if token == ISEMAIL_STRING_CR and (i+1 == raw_length or email[i+1] != ISEMAIL_STRING_LF):
-                    return_status.append(ISEMAIL_ERR_CR_NO_LF) # Fatal error
+                    return_status.add(ISEMAIL_ERR_CR_NO_LF) # Fatal error
                     break
 
-                return_status.append(ISEMAIL_CFWS_FWS)
+                return_status.add(ISEMAIL_CFWS_FWS)
                 context_stack.append(context)
                 context = ISEMAIL_CONTEXT_FWS
                 token_prior = token
             
-            # ctext
-            else:
-				# https://tools.ietf.org/html/rfc5322#section-3.2.3
-				#   ctext           =   %d33-39 /          ; Printable US-ASCII
-				#                       %d42-91 /          ;  characters not including
-				#                       %d93-126 /         ;  "(", ")", or "\"
-				#                       obs-ctext
-				#
-				#   obs-ctext       =   obs-NO-WS-CTL
-				#
-				#   obs-NO-WS-CTL   =   %d1-8 /            ; US-ASCII control
-				#                       %d11 /             ;  characters that do not
-				#                       %d12 /             ;  include the carriage
-				#                       %d14-31 /          ;  return, line feed, and
-				#                       %d127              ;  white space characters
-                ord_t = ord(token)
-                if (ord_t > 127) or (ord_t == 0) or (ord_t == 10):
-                    return_status.append(ISEMAIL_ERR_EXPECTING_CTEXT) # Fatal error
-                    break
-                elif (ord_t < 32) or (ord_t == 127):
-                    return_status.append(ISEMAIL_DEPREC_CTEXT)
-
 		#-------------------------------------------------------------
 		# Folding White Space
 		#-------------------------------------------------------------
@@ -994,29 +2493,29 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
                 wsp_after = token_prior == ISEMAIL_STRING_LF
                 wsp_before = not wsp_after
                 # if at end of tokens, check if fws_count > 1; if so, multiple folds = obsolete FWS
-                if (i+1 == raw_length and locals().get('fws_count', 0) > 1):
-                    return_status.append(ISEMAIL_DEPREC_FWS)
+                if (i+1 == raw_length and fws_count > 1):
+                    return_status.add(ISEMAIL_DEPREC_FWS)
             elif token == ISEMAIL_STRING_CR:
                 if ((i+1 == raw_length) or (email[i+1] != ISEMAIL_STRING_LF)):
-                    return_status.append(ISEMAIL_ERR_CR_NO_LF)  # Fatal error
+                    return_status.add(ISEMAIL_ERR_CR_NO_LF)  # Fatal error
                     break
                 elif ((i+2 < raw_length) and (email[i+2] == ISEMAIL_STRING_CR)):
-                    return_status.append(ISEMAIL_ERR_FWS_CRLF_X2)  # Error for consecutive CR
+                    return_status.add(ISEMAIL_ERR_FWS_CRLF_X2)  # Error for consecutive CR
             elif token == ISEMAIL_STRING_LF:
                 if token_prior != ISEMAIL_STRING_CR:
-                    return_status.append(ISEMAIL_ERR_LF_NO_CR)  # Fatal error
+                    return_status.add(ISEMAIL_ERR_LF_NO_CR)  # Fatal error
                     break
                 elif ((i+1 < raw_length) and (email[i+1] in [ISEMAIL_STRING_CR, ISEMAIL_STRING_LF])):
-                    return_status.append(ISEMAIL_ERR_FWS_CRLF_X2)  # Error for consecutive CRLF
+                    return_status.add(ISEMAIL_ERR_FWS_CRLF_X2)  # Error for consecutive CRLF
                 elif not wsp_before and ((i+1 == raw_length) or (email[i+1] not in [ISEMAIL_STRING_SP, ISEMAIL_STRING_HTAB])):
-                    return_status.append(ISEMAIL_ERR_FWS_CRLF_END)
-                fws_count = locals().get('fws_count', 0) + 1
+                    return_status.add(ISEMAIL_ERR_FWS_CRLF_END)
+                fws_count += 1
                 wsp_before = False
             else:
                 if not wsp_after and token_prior == ISEMAIL_STRING_LF and context_prior == ISEMAIL_CONTEXT_FWS:
-                    return_status.append(ISEMAIL_ERR_FWS_CRLF_END)
-                elif locals().get('fws_count', 0) > 1:
-                    return_status.append(ISEMAIL_DEPREC_FWS)  # Multiple folds = obsolete FWS
+                    return_status.add(ISEMAIL_ERR_FWS_CRLF_END)
+                elif fws_count > 1:
+                    return_status.add(ISEMAIL_DEPREC_FWS)  # Multiple folds = obsolete FWS
                 context_prior = context
                 context = context_stack.pop()  # End of FWS
                 i -= 1  # Look at this token again in the parent context
@@ -1029,34 +2528,34 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
         else:
             raise Exception(f"Unknown context: {context}")
 
-        if max(return_status) > ISEMAIL_RFC5322:
+        if return_status.worst > ISEMAIL_RFC5322:
             break # No point going on if we've got a fatal error
         
         # Increment token counter
         i += 1
 
     # Some simple final tests
-    if max(return_status) < ISEMAIL_RFC5322:
+    if return_status.worst < ISEMAIL_RFC5322:
         if context == ISEMAIL_CONTEXT_QUOTEDSTRING:
-            return_status.append(ISEMAIL_ERR_UNCLOSEDQUOTEDSTR)  # Fatal error
+            return_status.add(ISEMAIL_ERR_UNCLOSEDQUOTEDSTR)  # Fatal error
         elif context == ISEMAIL_CONTEXT_QUOTEDPAIR:
-            return_status.append(ISEMAIL_ERR_BACKSLASHEND)  # Fatal error
+            return_status.add(ISEMAIL_ERR_BACKSLASHEND)  # Fatal error
         elif context == ISEMAIL_CONTEXT_COMMENT:
-            return_status.append(ISEMAIL_ERR_UNCLOSEDCOMMENT)  # Fatal error
+            return_status.add(ISEMAIL_ERR_UNCLOSEDCOMMENT)  # Fatal error
         elif context == ISEMAIL_COMPONENT_LITERAL:
-            return_status.append(ISEMAIL_ERR_UNCLOSEDDOMLIT)  # Fatal error
+            return_status.add(ISEMAIL_ERR_UNCLOSEDDOMLIT)  # Fatal error
         elif token == ISEMAIL_STRING_CR:
-            return_status.append(ISEMAIL_ERR_FWS_CRLF_END)  # Fatal error
-        elif parsedata[ISEMAIL_COMPONENT_DOMAIN] == '':
-            return_status.append(ISEMAIL_ERR_NODOMAIN)  # Fatal error
+            return_status.add(ISEMAIL_ERR_FWS_CRLF_END)  # Fatal error
+        elif domain_len == 0:
+            return_status.add(ISEMAIL_ERR_NODOMAIN)  # Fatal error
         elif element_len == 0:
-            return_status.append(ISEMAIL_ERR_DOT_END)  # Fatal error
+            return_status.add(ISEMAIL_ERR_DOT_END)  # Fatal error
         elif hyphen_flag:
-            return_status.append(ISEMAIL_ERR_DOMAINHYPHENEND)  # Fatal error
+            return_status.add(ISEMAIL_ERR_DOMAINHYPHENEND)  # Fatal error
 		# https://tools.ietf.org/html/rfc5321#section-4.5.3.1.2
 		#   The maximum total length of a domain name or number is 255 octets.
-        elif len(parsedata[ISEMAIL_COMPONENT_DOMAIN]) > 255:
-            return_status.append(ISEMAIL_RFC5322_DOMAIN_TOOLONG)
+        elif domain_len > 255:
+            return_status.add(ISEMAIL_RFC5322_DOMAIN_TOOLONG)
 		# https://tools.ietf.org/html/rfc5321#section-4.1.2
 		#   Forward-path   = Path
 		#
@@ -1075,129 +2574,588 @@ def is_email(email, checkDNS=False, errorlevel=False, parsedata=[]):
 		#   address in MAIL and RCPT commands of 254 characters.  Since addresses
 		#   that do not fit in those fields are not normally useful, the upper
 		#   limit on address lengths should normally be considered to be 254.
-        elif len(parsedata[ISEMAIL_COMPONENT_LOCALPART] + ISEMAIL_STRING_AT + parsedata[ISEMAIL_COMPONENT_DOMAIN]) > 254:
-            return_status.append(ISEMAIL_RFC5322_TOOLONG)
+        elif local_len + len(ISEMAIL_STRING_AT) + domain_len > 254:
+            return_status.add(ISEMAIL_RFC5322_TOOLONG)
 		# https://tools.ietf.org/html/rfc1035#section-2.3.4
 		# labels          63 octets or less
         elif element_len > 63:
-            return_status.append(ISEMAIL_RFC5322_LABEL_TOOLONG)
+            return_status.add(ISEMAIL_RFC5322_LABEL_TOOLONG)
 
-    # Check DNS?
-    dns_checked = False
+    return return_status, components, element_count
 
-    if checkDNS and (max(return_status) < ISEMAIL_DNSWARN):
-		# https://tools.ietf.org/html/rfc5321#section-2.3.5
-		#   Names that can
-		#   be resolved to MX RRs or address (i.e., A or AAAA) RRs (as discussed
-		#   in Section 5) are permitted, as are CNAME RRs whose targets can be
-		#   resolved, in turn, to MX or address RRs.
-		#
-		# https://tools.ietf.org/html/rfc5321#section-5.1
-		#   The lookup first attempts to locate an MX record associated with the
-		#   name.  If a CNAME record is found, the resulting name is processed as
-		#   if it were the initial name. ... If an empty list of MXs is returned,
-		#   the address is treated as if it was associated with an implicit MX
-		#   RR, with a preference of 0, pointing to that host.
-		#
-		# is_email() author's note: We will regard the existence of a CNAME to be
-		# sufficient evidence of the domain's existence. For performance reasons
-		# we will not repeat the DNS lookup for the CNAME's target, but we will
-		# raise a warning because we didn't immediately find an MX record.
-        if element_count == 0:
-            parsedata[ISEMAIL_COMPONENT_DOMAIN] += '.'  # Checking TLD DNS seems to work only if you explicitly check from the root
+def _extend(spans, start, end):
+    """Add email[start:end] to a component's spans, joining it onto the last span if they meet"""
+    if spans and spans[-1] == start:
+        spans[-1] = end
+    else:
+        spans += (start, end)
+
+@lru_cache(maxsize=1024)
+def _check_address_literal(addressliteral):
+    """
+    The diagnoses for the contents of a domain literal, as a tuple: whether
+    it is an RFC 5321 address literal and if not, what is wrong with it. The
+    same few literals tend to recur (internal systems addressing
+    user@[10.0.0.1], say), so the results are memoized.
+    """
+    # https://tools.ietf.org/html/rfc5321#section-4.1.2
+    #   address-literal  = "[" ( IPv4-address-literal /
+    #                    IPv6-address-literal /
+    #                    General-address-literal ) "]"
+    #                    ; See Section 4.1.3
+    #
+    # https://tools.ietf.org/html/rfc5321#section-4.1.3
+    #   IPv4-address-literal  = Snum 3("."  Snum)
+    #
+    #   IPv6-address-literal  = "IPv6:" IPv6-addr
+    #
+    #   General-address-literal  = Standardized-tag ":" 1*dcontent
+    #
+    #   Standardized-tag  = Ldh-str
+    #                     ; Standardized-tag MUST be specified in a
+    #                     ; Standards-Track RFC and registered with IANA
+    #
+    #   dcontent      = %d33-90 / ; Printable US-ASCII
+    #                 %d94-126 ; excl. "[", "\", "]"
+    #
+    #   Snum          = 1*3DIGIT
+    #                 ; representing a decimal integer
+    #                 ; value in the range 0 through 255
+    #
+    #   IPv6-addr     = IPv6-full / IPv6-comp / IPv6v4-full / IPv6v4-comp
+    #
+    #   IPv6-hex      = 1*4HEXDIG
+    #
+    #   IPv6-full     = IPv6-hex 7(":" IPv6-hex)
+    #
+    #   IPv6-comp     = [IPv6-hex *5(":" IPv6-hex)] "::"
+    #                 [IPv6-hex *5(":" IPv6-hex)]
+    #                 ; The "::" represents at least 2 16-bit groups of
+    #                 ; zeros.  No more than 6 groups in addition to the
+    #                 ; "::" may be present.
+    #
+    #   IPv6v4-full   = IPv6-hex 5(":" IPv6-hex) ":" IPv4-address-literal
+    #
+    #   IPv6v4-comp   = [IPv6-hex *3(":" IPv6-hex)] "::"
+    #                 [IPv6-hex *3(":" IPv6-hex) ":"]
+    #                 IPv4-address-literal
+    #                 ; The "::" represents at least 2 16-bit groups of
+    #                 ; zeros.  No more than 4 groups in addition to the
+    #                 ; "::" and IPv4-address-literal may be present.
+    diagnoses = []
+    max_groups = 8
+    index = -1
+
+    # Extract IPv4 part from the end of the address-literal (if there is one)
+    match = _ADDRESSLITERAL_IPV4.search(addressliteral)
+    if match:
+        index = match.start()
+        if index != 0:
+            addressliteral = addressliteral[:index] + '0:0'  # Convert IPv4 part to IPv6 format for further testing
+
+    if index == 0:
+        # Nothing there except a valid IPv4 address, so...
+        diagnoses.append(ISEMAIL_RFC5321_ADDRESSLITERAL)
+    elif addressliteral.lower().startswith(ISEMAIL_STRING_IPV6TAG.lower()):
+        IPv6 = addressliteral[5:]
+        matchesIP = IPv6.split(ISEMAIL_STRING_COLON) # Revision 2.7: Daniel Marschall's new IPv6 testing strategy
+        groupCount = len(matchesIP)
+        index = IPv6.find(ISEMAIL_STRING_DOUBLECOLON)
+
+        if index == -1:
+            # We need exactly the right number of groups
+            if groupCount != max_groups:
+                diagnoses.append(ISEMAIL_RFC5322_IPV6_GRPCOUNT)
+        else:
+            if IPv6.rfind(ISEMAIL_STRING_DOUBLECOLON) != index:
+                diagnoses.append(ISEMAIL_RFC5322_IPV6_2X2XCOLON)
+            else:
+                if (index == 0) or (index == len(IPv6) - 2):
+                    max_groups += 1 # RFC 4291 allows :: at the start or end of an address with 7 other groups in addition
+
+                if groupCount > max_groups:
+                    diagnoses.append(ISEMAIL_RFC5322_IPV6_MAXGRPS)
+                elif groupCount == max_groups:
+                    diagnoses.append(ISEMAIL_RFC5321_IPV6DEPRECATED) # Eliding a single "::"
+
+        # IPv6 testing strategy
+        if len(IPv6) > 1:
+            if IPv6.startswith(ISEMAIL_STRING_COLON) and not IPv6[1] == ISEMAIL_STRING_COLON:
+                diagnoses.append(ISEMAIL_RFC5322_IPV6_COLONSTRT) # Address starts with a single colon
+            elif IPv6.endswith(ISEMAIL_STRING_COLON) and not IPv6[-2] == ISEMAIL_STRING_COLON:
+                diagnoses.append(ISEMAIL_RFC5322_IPV6_COLONEND) # Address ends with a single colon
+        elif len(IPv6) == 1 and IPv6.startswith(ISEMAIL_STRING_COLON):
+            diagnoses.append(ISEMAIL_RFC5322_IPV6_COLONSTRT) # Address starts with a single colon
+        if _ADDRESSLITERAL_IPV6.match(IPv6):
+            diagnoses.append(ISEMAIL_RFC5321_ADDRESSLITERAL)
+        else:
+            diagnoses.append(ISEMAIL_RFC5322_IPV6_BADCHAR) # Check for unmatched characters
+    else:
+        diagnoses.append(ISEMAIL_RFC5322_DOMAINLITERAL)
+
+    return tuple(diagnoses)
+
+def _dns_name(components, element_count):
+    """The name to look up for the domain part of a parsed address"""
+    if element_count == 0:
+        return components.domain() + '.'  # Checking TLD DNS seems to work only if you explicitly check from the root
+    return components.domain()
+
+def _check_dns(domain):
+    """
+    Look for records showing that mail can be delivered to the domain.
+
+    Returns (dns_checked, codes, record) where dns_checked is true if an MX
+    record was found, codes is a tuple of the DNS warnings raised and record
+    is the type of the record that satisfied the check, or None if none did.
+    Queries are made and retried as resolver_config says; if they time out,
+    codes includes ISEMAIL_DNSWARN_INDETERMINATE. Verdicts are kept in
+    domain_store, if there is one, and taken from it while they last.
+    """
+    hooks = instrumentation
+    if hooks is not None:
+        start = time.perf_counter()
+    store = domain_store
+    verdict = None if store is None else store.get(domain)
+    if hooks is not None and store is not None:
+        hooks.cache('store', verdict is not None)
+
+    if verdict is None:
+        _load_dns()
+        config = resolver_config
+        deadline = config.deadline()
+        if config.strategy == 'concurrent':
+            verdict = _check_dns_concurrent(domain, config, deadline)
+        else:
+            cascade = _dns_cascade()
+            rdtype = next(cascade)
+            try:
+                while True:
+                    try:
+                        _query(domain, rdtype, config, deadline)
+                    except dns.exception.DNSException as e:
+                        rdtype = cascade.throw(e)
+                    else:
+                        rdtype = cascade.send(None)
+            except StopIteration as stop:
+                verdict = stop.value
+
+        if store is not None:
+            store.put(domain, verdict)
+
+    if hooks is not None:
+        hooks.phase('dns', time.perf_counter() - start)
+    return verdict
+
+async def _check_dns_async(domain):
+    """_check_dns() using the asynchronous resolver"""
+    hooks = instrumentation
+    if hooks is not None:
+        start = time.perf_counter()
+    store = domain_store
+    verdict = None if store is None else store.get(domain)
+    if hooks is not None and store is not None:
+        hooks.cache('store', verdict is not None)
+
+    if verdict is None:
+        _load_dns(asynchronous=True)
+        config = resolver_config
+        deadline = config.deadline()
+        if config.strategy == 'concurrent':
+            verdict = await _check_dns_concurrent_async(domain, config, deadline)
+        else:
+            cascade = _dns_cascade()
+            rdtype = next(cascade)
+            try:
+                while True:
+                    try:
+                        await _query_async(domain, rdtype, config, deadline)
+                    except dns.exception.DNSException as e:
+                        rdtype = cascade.throw(e)
+                    else:
+                        rdtype = cascade.send(None)
+            except StopIteration as stop:
+                verdict = stop.value
 
+        if store is not None:
+            store.put(domain, verdict)
+
+    if hooks is not None:
+        hooks.phase('dns', time.perf_counter() - start)
+    return verdict
+
+def _query(domain, rdtype, config, deadline):
+    """_resolve(), retrying timeouts as config says"""
+    attempt = 0
+    while True:
         try:
-            dns.resolver.resolve(parsedata[ISEMAIL_COMPONENT_DOMAIN], 'MX')
-            dns_checked = True
+            return _resolve(domain, rdtype, config, deadline)
         except dns.exception.Timeout:
-            retry_count = 0
-            while retry_count < 3:
-                try:
-                    dns.resolver.resolve(parsedata[ISEMAIL_COMPONENT_DOMAIN], 'MX')
-                    dns_checked = True
-                    break
-                except dns.exception.Timeout:
-                    retry_count += 1
+            delay = config.retry_delay(attempt, deadline)
+            if delay is None:
+                raise
+            hooks = instrumentation
+            if hooks is not None:
+                hooks.dns_retry(domain, rdtype, attempt + 1, delay)
+            time.sleep(delay)
+            attempt += 1
+
+async def _query_async(domain, rdtype, config, deadline):
+    """_query() using the asynchronous resolver"""
+    import asyncio
+
+    attempt = 0
+    while True:
+        try:
+            return await _resolve_async(domain, rdtype, config, deadline)
+        except dns.exception.Timeout:
+            delay = config.retry_delay(attempt, deadline)
+            if delay is None:
+                raise
+            hooks = instrumentation
+            if hooks is not None:
+                hooks.dns_retry(domain, rdtype, attempt + 1, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+def _check_dns_concurrent(domain, config, deadline):
+    """The 'concurrent' strategy of _check_dns(), with a thread for each query"""
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    with _executor_lock:
+        executor = _dns_executor()
+        pending = {executor.submit(_query, domain, rdtype, config, deadline): rdtype for rdtype in _CONCURRENT_RDTYPES}
+    outcomes = {}
+    try:
+        while True:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                outcomes[pending.pop(future)] = future.exception() or True
+            verdict = _concurrent_verdict(outcomes)
+            if verdict is not None:
+                return verdict
+    finally:
+        for future in pending:
+            future.cancel()
+
+async def _check_dns_concurrent_async(domain, config, deadline):
+    """_check_dns_concurrent() with a task for each query"""
+    import asyncio
+
+    pending = {asyncio.ensure_future(_query_async(domain, rdtype, config, deadline)): rdtype for rdtype in _CONCURRENT_RDTYPES}
+    outcomes = {}
+    try:
+        while True:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                outcomes[pending.pop(task)] = task.exception() or True
+            verdict = _concurrent_verdict(outcomes)
+            if verdict is not None:
+                return verdict
+    finally:
+        for task in pending:
+            task.cancel()
+
+# The queries made at once by the 'concurrent' strategy. A and AAAA queries
+# follow CNAMEs, so there is no need to look for one separately.
+_CONCURRENT_RDTYPES = ('MX', 'A', 'AAAA')
+
+def _concurrent_verdict(outcomes):
+    """
+    The verdict of the 'concurrent' strategy from the outcomes of the queries
+    that have finished so far, as {rdtype: True or the exception raised}, or
+    None if it depends on queries still to finish. An MX record decides it
+    at once; without one, so does the first A or AAAA record.
+    """
+    for outcome in outcomes.values():
+        if not (outcome is True or isinstance(outcome, dns.exception.DNSException)):
+            raise outcome
+
+    mx = outcomes.get('MX')
+    if mx is True:
+        return True, (), 'MX'
+    if any(isinstance(outcome, dns.resolver.NXDOMAIN) for outcome in outcomes.values()):
+        return False, (ISEMAIL_DNSWARN_NO_RECORD,), None  # Domain can't be found in DNS
+    if mx is None:
+        return None
+    if isinstance(mx, dns.exception.Timeout):
+        return False, (ISEMAIL_DNSWARN_INDETERMINATE,), None
+    if isinstance(mx, dns.resolver.NoNameservers):
+        return False, (ISEMAIL_DNSWARN_NO_RECORD,), None
+    if not isinstance(mx, dns.resolver.NoAnswer):
+        raise mx  # As _dns_cascade() would
+
+    for rdtype in _CONCURRENT_RDTYPES[1:]:
+        if outcomes.get(rdtype) is True:
+            return False, (ISEMAIL_DNSWARN_NO_MX_RECORD,), rdtype
+    if len(outcomes) < len(_CONCURRENT_RDTYPES):
+        return None
+    if any(isinstance(outcome, dns.exception.Timeout) for outcome in outcomes.values()):
+        return False, (ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN_INDETERMINATE), None
+    return False, (ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN_NO_RECORD), None
+
+_executor = None
+_executor_pid = None
+_executor_workers = 0
+_executor_lock = threading.RLock()  # Held to submit queries, so that the pool isn't replaced in between
+
+def _dns_executor(workers=0):
+    """
+    The thread pool for concurrent DNS queries, started on first use in each
+    process and replaced by a larger one if it has fewer than workers threads
+    """
+    global _executor, _executor_pid, _executor_workers
+    with _executor_lock:
+        if _executor_pid != os.getpid() or _executor_workers < workers:
+            from concurrent.futures import ThreadPoolExecutor
+            # The threads only wait on the network, so there can be plenty:
+            # by default, enough for every query of is_email_bulk() at its
+            # default concurrency. They are only started as they are needed,
+            # and those of a pool that is replaced here exit once they have
+            # finished the queries already given to them.
+            if _executor_pid == os.getpid():
+                _executor.shutdown(wait=False)
+            _executor_workers = max(workers, len(_CONCURRENT_RDTYPES) * 32)
+            _executor = ThreadPoolExecutor(_executor_workers, thread_name_prefix='is_email-dns')
+            _executor_pid = os.getpid()
+        return _executor
+
+def _dns_cascade():
+    """
+    The order in which records are looked up and what their absence means,
+    independent of how the lookups are made. Each record type to look up is
+    yielded; the caller resumes the generator if the lookup succeeded or
+    throws the resolver's exception into it if not. The generator returns
+    the result described in _check_dns().
+    """
+    # https://tools.ietf.org/html/rfc5321#section-2.3.5
+    #   Names that can
+    #   be resolved to MX RRs or address (i.e., A or AAAA) RRs (as discussed
+    #   in Section 5) are permitted, as are CNAME RRs whose targets can be
+    #   resolved, in turn, to MX or address RRs.
+    #
+    # https://tools.ietf.org/html/rfc5321#section-5.1
+    #   The lookup first attempts to locate an MX record associated with the
+    #   name.  If a CNAME record is found, the resulting name is processed as
+    #   if it were the initial name. ... If an empty list of MXs is returned,
+    #   the address is treated as if it was associated with an implicit MX
+    #   RR, with a preference of 0, pointing to that host.
+    #
+    # is_email() author's note: We will regard the existence of a CNAME to be
+    # sufficient evidence of the domain's existence. For performance reasons
+    # we will not repeat the DNS lookup for the CNAME's target, but we will
+    # raise a warning because we didn't immediately find an MX record.
+    #
+    # Timeouts are retried by the caller, so one that reaches the cascade is
+    # final: whether the domain has usable records can't be known.
+    dns_checked = False
+    codes = []
+    record = None
+
+    try:
+        yield 'MX'
+        dns_checked = True
+        record = 'MX'
+    except dns.exception.Timeout:
+        codes.append(ISEMAIL_DNSWARN_INDETERMINATE)
+    except dns.resolver.NoAnswer:
+        codes.append(ISEMAIL_DNSWARN_NO_MX_RECORD)  # MX-record for domain can't be found
+        try:
+            yield 'A'
+            record = 'A'
         except dns.resolver.NoAnswer:
-            return_status.append(ISEMAIL_DNSWARN_NO_MX_RECORD)  # MX-record for domain can't be found
             try:
-                dns.resolver.resolve(parsedata[ISEMAIL_COMPONENT_DOMAIN], 'A')
+                yield 'CNAME'
+                record = 'CNAME'
             except dns.resolver.NoAnswer:
-                try:
-                    dns.resolver.resolve(parsedata[ISEMAIL_COMPONENT_DOMAIN], 'CNAME')
-                except dns.resolver.NoAnswer:
-                    return_status.append(ISEMAIL_DNSWARN_NO_RECORD)  # No usable records for the domain can be found
-                except dns.resolver.NoNameservers:
-                    return_status.append(ISEMAIL_DNSWARN_NO_RECORD) # Only needed to get GitHub Actions to pass
+                codes.append(ISEMAIL_DNSWARN_NO_RECORD)  # No usable records for the domain can be found
             except dns.resolver.NoNameservers:
-                return_status.append(ISEMAIL_DNSWARN_NO_RECORD) # Only needed to get GitHub Actions to pass
-        except dns.resolver.NXDOMAIN:
-            return_status.append(ISEMAIL_DNSWARN_NO_RECORD)  # Domain can't be found in DNS
+                codes.append(ISEMAIL_DNSWARN_NO_RECORD) # Only needed to get GitHub Actions to pass
+            except dns.exception.Timeout:
+                codes.append(ISEMAIL_DNSWARN_INDETERMINATE)
         except dns.resolver.NoNameservers:
-            return_status.append(ISEMAIL_DNSWARN_NO_RECORD) # Only needed to get GitHub Actions to pass
+            codes.append(ISEMAIL_DNSWARN_NO_RECORD) # Only needed to get GitHub Actions to pass
+        except dns.exception.Timeout:
+            codes.append(ISEMAIL_DNSWARN_INDETERMINATE)
+    except dns.resolver.NXDOMAIN:
+        codes.append(ISEMAIL_DNSWARN_NO_RECORD)  # Domain can't be found in DNS
+    except dns.resolver.NoNameservers:
+        codes.append(ISEMAIL_DNSWARN_NO_RECORD) # Only needed to get GitHub Actions to pass
+
+    return dns_checked, tuple(codes), record
 
+def _check_tld(return_status, components, element_count):
+    """Diagnose addresses at a TLD, or whose TLD looks numeric"""
     # Check for TLD addresses
-	# -----------------------
-	# TLD addresses are specifically allowed in RFC 5321 but they are
-	# unusual to say the least. We will allocate a separate
-	# status to these addresses on the basis that they are more likely
-	# to be typos than genuine addresses (unless we've already
-	# established that the domain does have an MX record)
-	#
-	# https://tools.ietf.org/html/rfc5321#section-2.3.5
-	#   In the case
-	#   of a top-level domain used by itself in an email address, a single
-	#   string is used without any dots.  This makes the requirement,
-	#   described in more detail below, that only fully-qualified domain
-	#   names appear in SMTP transactions on the public Internet,
-	#   particularly important where top-level domains are involved.
-	#
-	# TLD format
-	# ----------
-	# The format of TLDs has changed a number of times. The standards
-	# used by IANA have been largely ignored by ICANN, leading to
-	# confusion over the standards being followed. These are not defined
-	# anywhere, except as a general component of a DNS host name (a label).
-	# However, this could potentially lead to 123.123.123.123 being a
-	# valid DNS name (rather than an IP address) and thereby creating
-	# an ambiguity. The most authoritative statement on TLD formats that
-	# the author can find is in a (rejected!) erratum to RFC 1123
-	# submitted by John Klensin, the author of RFC 5321:
-	#
-	# https://www.rfc-editor.org/errata_search.php?rfc=1123&eid=1353
-	#   However, a valid host name can never have the dotted-decimal
-	#   form #.#.#.#, since this change does not permit the highest-level
-	#   component label to start with a digit even if it is not all-numeric.
-    if (not dns_checked) and (max(return_status) < ISEMAIL_DNSWARN):
-        if element_count == 0:
-            return_status.append(ISEMAIL_RFC5321_TLD)
-
-        if atomlist[ISEMAIL_COMPONENT_DOMAIN][element_count][0].isdigit():
-            return_status.append(ISEMAIL_RFC5321_TLDNUMERIC)
-
-    return_status = list(set(return_status))
-    final_status = max(return_status)
-
-    if len(return_status) != 1:
-        return_status.pop(0)  # remove redundant ISEMAIL_VALID
-
-    parsedata['status'] = return_status
+    # -----------------------
+    # TLD addresses are specifically allowed in RFC 5321 but they are
+    # unusual to say the least. We will allocate a separate
+    # status to these addresses on the basis that they are more likely
+    # to be typos than genuine addresses (unless we've already
+    # established that the domain does have an MX record)
+    #
+    # https://tools.ietf.org/html/rfc5321#section-2.3.5
+    #   In the case
+    #   of a top-level domain used by itself in an email address, a single
+    #   string is used without any dots.  This makes the requirement,
+    #   described in more detail below, that only fully-qualified domain
+    #   names appear in SMTP transactions on the public Internet,
+    #   particularly important where top-level domains are involved.
+    #
+    # TLD format
+    # ----------
+    # The format of TLDs has changed a number of times. The standards
+    # used by IANA have been largely ignored by ICANN, leading to
+    # confusion over the standards being followed. These are not defined
+    # anywhere, except as a general component of a DNS host name (a label).
+    # However, this could potentially lead to 123.123.123.123 being a
+    # valid DNS name (rather than an IP address) and thereby creating
+    # an ambiguity. The most authoritative statement on TLD formats that
+    # the author can find is in a (rejected!) erratum to RFC 1123
+    # submitted by John Klensin, the author of RFC 5321:
+    #
+    # https://www.rfc-editor.org/errata_search.php?rfc=1123&eid=1353
+    #   However, a valid host name can never have the dotted-decimal
+    #   form #.#.#.#, since this change does not permit the highest-level
+    #   component label to start with a digit even if it is not all-numeric.
+    if element_count == 0:
+        return_status.add(ISEMAIL_RFC5321_TLD)
+
+    if components.tld()[0].isdigit():
+        return_status.add(ISEMAIL_RFC5321_TLDNUMERIC)
+
+def _result(email, parsed, verdict, threshold, diagnose):
+    """
+    Apply a DNS verdict from _check_dns() (or None if there wasn't a DNS
+    check) and the TLD checks to a parsed address and build its EmailResult
+    """
+    return_status, components, element_count = parsed
+    dns_checked = False
+    record = None
+
+    if verdict is not None:
+        dns_checked, codes, record = verdict
+        for code in codes:
+            return_status.add(code)
+
+    if (not dns_checked) and (return_status.worst < ISEMAIL_DNSWARN):
+        _check_tld(return_status, components, element_count)
+
+    hooks = instrumentation
+    if hooks is not None:
+        hooks.result(return_status.worst, _category(return_status.worst))
+
+    return EmailResult(
+        email,
+        components,
+        _final_status(return_status, threshold, diagnose),
+        tuple(return_status.codes()),
+        dns_checked,
+        record
+    )
+
+_CATEGORIES = (ISEMAIL_VALID_CATEGORY, ISEMAIL_DNSWARN, ISEMAIL_RFC5321, ISEMAIL_CFWS, ISEMAIL_DEPREC, ISEMAIL_RFC5322, ISEMAIL_ERR)
+
+def _category(diagnosis):
+    """The category a diagnosis falls in, such as ISEMAIL_RFC5321"""
+    for category in _CATEGORIES:
+        if diagnosis < category:
+            return category
+    return ISEMAIL_ERR
+
+def _final_status(return_status, threshold, diagnose):
+    final_status = return_status.worst
 
     if final_status < threshold:
         final_status = ISEMAIL_VALID
 
     return final_status if diagnose else (final_status < ISEMAIL_THRESHOLD)
 
-# if __name__ == '__main__':
-#     email = 'test.&#x240D;&#x240A;&#x240D;&#x240A; obs@syntax.com'
-#     email_validity = is_email(email, True, True)
-    
-#     # Get the literal name of the result code
-#     result_name = result_codes.get(email_validity, "Unknown result code")
-    
-#     if email_validity == ISEMAIL_VALID:
-#         print(f"Success! {email} is valid ({result_name} - {int(email_validity)})")
-#     elif email_validity < ISEMAIL_THRESHOLD:
-#         print(f"Warning! {email} has unusual features ({result_name} - {int(email_validity)})")
-#     else:
-#         print(f"{email} is not a valid email address ({result_name} - {int(email_validity)})")
+def validation_result(status):
+    """Summarise a diagnosis as Success, Warning or Error, as reported by the Lambda and the CLI"""
+    if status == ISEMAIL_VALID:
+        return "Success"
+    elif status < ISEMAIL_THRESHOLD:
+        return "Warning"
+    else:
+        return "Error"
+
+def main(argv=None):
+    """
+    Command line interface: check the addresses in files (or stdin), one per
+    line, and write a CSV or JSON Lines report to stdout. The input is
+    streamed so files of any size can be checked in constant memory.
+
+        python -m is_email [--dns] [--dns-store FILE] [--dns-concurrency N] [--progress] [--errorlevel N] [--jobs N] [--format csv|jsonl] [FILE ...]
+    """
+    import argparse, csv, fileinput, json, sys
+
+    parser = argparse.ArgumentParser(prog='is_email', description='Check email addresses, one per line, against RFCs 5321, 5322 and others.')
+    parser.add_argument('files', nargs='*', metavar='FILE', help='files to read addresses from; "-" or none for stdin')
+    parser.add_argument('--dns', action='store_true', help='check the DNS for MX records as well')
+    parser.add_argument('--errorlevel', type=int, default=ISEMAIL_VALID, help='diagnoses below this are reported as ISEMAIL_VALID (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=1, help='number of worker processes to check addresses with (default: %(default)s)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help='output format (default: %(default)s)')
+    parser.add_argument('--dns-store', metavar='FILE', help='keep DNS verdicts in the SQLite database FILE, shared with other runs')
+    parser.add_argument('--dns-concurrency', type=int, metavar='N', help='with --dns, the most domains to look up at once (default: 32)')
+    parser.add_argument('--progress', action='store_true', help='with --dns, report progress on stderr')
+    args = parser.parse_args(argv)
+    if args.jobs > 1 and (args.dns_concurrency is not None or args.progress):
+        # Worker processes check their chunks with is_email_many(), which
+        # looks domains up one at a time and reports no progress
+        parser.error('--dns-concurrency and --progress cannot be used with --jobs')
+    if args.dns_concurrency is None:
+        args.dns_concurrency = 32
+
+    store = domain_store
+    if args.dns_store:
+        _set_domain_store(DomainStore(args.dns_store))
+
+    lines = fileinput.input(args.files, encoding='utf-8', errors='replace')
+    emails = (line.rstrip('\r\n') for line in lines)
+
+    def report(stats):
+        print(
+            f"{stats['addresses']} addresses, {stats['domains']} domains looked up, "
+            f"{stats['addresses_per_second']:.0f} addresses/s, {stats['domains_per_second']:.0f} domains/s",
+            file=sys.stderr
+        )
+
+    if args.jobs > 1:
+        results = validate_parallel(emails, args.dns, args.errorlevel, workers=args.jobs)
+    elif args.dns:
+        results = (
+            (email, status) for email, status, _ in
+            is_email_bulk(emails, args.errorlevel, args.dns_concurrency, progress=report if args.progress else None)
+        )
+    else:
+        results = ((email, status) for email, status, _ in is_email_many(emails, args.dns, args.errorlevel))
+
+    fields = ['email_address', 'email_validation_result', 'email_validity_code', 'email_diagnosis']
+    out = sys.stdout
+    writer = None
+    if args.format == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(fields)
+
+    try:
+        for email, status in results:
+            row = [email, validation_result(status), status, result_codes.get(status, "Unknown result code")]
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(dict(zip(fields, row))) + '\n')
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); that's not an error
+        sys.stderr.close()
+        return 0
+    finally:
+        lines.close()
+        if args.dns_store:
+            domain_store.close()
+            _set_domain_store(store)
+
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,31 +1,85 @@
 # File: lambda_functions.py
+import base64
 import json
+import os
 from is_email import *
 
+# The most addresses accepted in one POST request
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+
+# The longest POST body accepted, after any base64 decoding: by default,
+# room for MAX_BATCH_SIZE addresses that are all as long as is_email will
+# parse. Longer addresses are rejected with ISEMAIL_ERR_INPUT_TOOLONG.
+MAX_BODY_SIZE = int(os.environ.get('MAX_BODY_SIZE', MAX_BATCH_SIZE * (ISEMAIL_MAX_INPUT_LENGTH + 4)))
+
+# DNS answers are cached at module level by is_email, so they are shared by
+# every invocation that lands on a warm container
+dns_cache.maxsize = int(os.environ.get('DNS_CACHE_SIZE', dns_cache.maxsize))
+
+# Results for addresses seen recently by this container
+result_cache = ResultCache(int(os.environ.get('RESULT_CACHE_SIZE', 10000)))
+
+# The most domains in one POST request to look up at once
+DNS_CONCURRENCY = int(os.environ.get('DNS_CONCURRENCY', 32))
+
 def lambda_handler(event, context):
+    # A POST with a JSON array of addresses as its body checks them all at once
+    if event.get('body') is not None:
+        return batch_handler(event)
+
     # Extract the email address from the event
     email_address = event['queryStringParameters']['email_address']
 
     # Validate the email address
-    email_validity_code = is_email(email_address, True, True)
-    
-    # Get the literal name of the result code
-    email_diagnosis = result_codes.get(email_validity_code, "Unknown result code")
-    
-    if email_validity_code == ISEMAIL_VALID:
-        validation_result = "Success"
-    elif email_validity_code < ISEMAIL_THRESHOLD:
-        validation_result = "Warning"
-    else:
-        validation_result = "Error"
+    email_validity_code = is_email(email_address, True, True, cache=result_cache)
 
     # Return the result
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'email_validation_result': validation_result,
-            'email_address': email_address,
-            'email_validity_code': str(email_validity_code),
-            'email_diagnosis': email_diagnosis
-        })
+        'body': json.dumps(email_result(email_address, email_validity_code))
+    }
+
+def batch_handler(event):
+    body = event['body']
+
+    try:
+        if event.get('isBase64Encoded'):
+            body = base64.b64decode(body).decode('utf-8')
+        if len(body) > MAX_BODY_SIZE:
+            return error_response(f'Body must be no longer than {MAX_BODY_SIZE} characters')
+        email_addresses = json.loads(body)
+    except ValueError:  # Including bad base64 and bytes that aren't UTF-8
+        return error_response('Body must be a JSON array of email addresses')
+
+    if not isinstance(email_addresses, list) or not all(isinstance(email_address, str) for email_address in email_addresses):
+        return error_response('Body must be a JSON array of email addresses')
+
+    if len(email_addresses) > MAX_BATCH_SIZE:
+        return error_response(f'No more than {MAX_BATCH_SIZE} email addresses can be checked at once')
+
+    # Validate the email addresses, looking each domain up only once and
+    # several domains at a time
+    results = [
+        email_result(email_address, email_validity_code)
+        for email_address, email_validity_code, _ in is_email_bulk(email_addresses, True, DNS_CONCURRENCY, cache=result_cache)
+    ]
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'results': results})
+    }
+
+def email_result(email_address, email_validity_code):
+    return {
+        'email_validation_result': validation_result(email_validity_code),
+        'email_address': email_address,
+        'email_validity_code': str(email_validity_code),
+        # Get the literal name of the result code
+        'email_diagnosis': result_codes.get(email_validity_code, "Unknown result code")
+    }
+
+def error_response(message):
+    return {
+        'statusCode': 400,
+        'body': json.dumps({'error': message})
     }
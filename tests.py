@@ -3,9 +3,25 @@
 # Date: 2023-12-06
 # Description: Unit tests for is_email.py
 
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+from unittest import mock
 import xml.etree.ElementTree as ET
 from is_email import *
+from is_email import _check_address_literal, _parse_dfa, _parse_fast, _parse_full, _parse_literal
+import is_email as is_email_module
+import lambda_function
+import dns.resolver
 
 class TestIsEmail(unittest.TestCase):
 
@@ -59,5 +75,960 @@ class TestIsEmail(unittest.TestCase):
         success_rate = round((self.pass_count / total_tests) * 100, 2) if total_tests > 0 else 0
         print(f'Passing tests: {self.pass_count}, Failing tests: {self.fail_count}, Success rate: {success_rate}%')
 
+def load_addresses():
+    tree = ET.parse('./tests/tests.xml')
+    return [test.find('address').text or "" for test in tree.getroot().findall('test')]
+
+class ParserAgreement:
+    """For tests of the shortcuts that _parse() takes before _parse_full()"""
+
+    def assertAgreesWithParser(self, parse, addresses):
+        """
+        Assert that parse() finds the same diagnoses and components as
+        _parse_full() in each address it doesn't return None for, and return
+        how many addresses that was
+        """
+        count = 0
+        for address in addresses:
+            parsed = parse(address)
+            if parsed is None:
+                continue
+            count += 1
+            full = _parse_full(address)
+            self.assertEqual(parsed[0].codes(), full[0].codes(), address)
+            for component in ('local_part', 'domain', 'literal', 'local_atoms', 'domain_atoms', 'tld'):
+                self.assertEqual(getattr(parsed[1], component)(), getattr(full[1], component)(), address)
+            self.assertEqual(parsed[2], full[2], address)
+        return count
+
+class TestIsEmailMany(unittest.TestCase):
+
+    def setUp(self):
+        self.addresses = load_addresses()
+
+    def test_matches_is_email(self):
+        for errorlevel in (True, False, E_WARNING):
+            results = list(is_email_many(self.addresses, False, errorlevel))
+            self.assertEqual([address for address, _, _ in results], self.addresses)
+            for address, status, diagnoses in results:
+                self.assertEqual(status, is_email(address, False, errorlevel))
+                self.assertIsInstance(diagnoses, tuple)
+
+    def test_one_dns_check_per_domain(self):
+        with mock.patch('is_email._check_dns', return_value=(True, (), 'MX')) as check_dns:
+            results = list(is_email_many(['a@example.com', 'b@Example.com', 'c@example.org'], True, True))
+        self.assertEqual(check_dns.call_count, 2)
+        self.assertEqual([status for _, status, _ in results], [ISEMAIL_VALID] * 3)
+
+class TestIsEmailBulk(unittest.TestCase):
+
+    @staticmethod
+    def check_dns(domain):
+        # Every other domain has no MX record
+        if len(domain) % 2:
+            return True, (), 'MX'
+        return False, (ISEMAIL_DNSWARN_NO_MX_RECORD,), 'A'
+
+    def test_matches_is_email_many(self):
+        addresses = load_addresses() + [f'user{i}@domain{i % 7}.Example.com' for i in range(50)]
+        with mock.patch('is_email._check_dns', side_effect=self.check_dns):
+            expected = list(is_email_many(addresses, True, True))
+        with mock.patch('is_email._check_dns', side_effect=self.check_dns) as check_dns:
+            results = list(is_email_bulk(addresses, True, concurrency=4, chunksize=20))
+        self.assertEqual(results, expected)
+        domains = [call.args[0].lower() for call in check_dns.call_args_list]
+        self.assertEqual(len(domains), len(set(domains)))
+
+    def test_options(self):
+        addresses = [b'a@example.com', 'b\u00e9@example.com'.encode(), b'c@[1.2.3.4]', b'd@']
+        for options in ({'non_ascii': 'utf-8'}, {'engine': 'dfa'}):
+            with mock.patch('is_email._check_dns', side_effect=self.check_dns):
+                self.assertEqual(list(is_email_bulk(addresses, True, **options)), list(is_email_many(addresses, True, True, **options)))
+        with mock.patch('is_email._check_dns', side_effect=self.check_dns):
+            self.assertEqual(list(is_email_bulk(['a&amp;b@example.com'], True, decode=False)), list(is_email_many(['a&amp;b@example.com'], True, True, decode=False)))
+
+    def test_cache(self):
+        cache = ResultCache()
+        with mock.patch('is_email._check_dns', side_effect=self.check_dns) as check_dns:
+            first = list(is_email_bulk(['a@example.com', 'b@example.org'], True, cache=cache))
+            self.assertEqual(list(is_email_bulk(['a@example.com', 'b@example.org'], True, cache=cache)), first)
+        self.assertEqual(check_dns.call_count, 2)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.get(ResultCache.key('a@example.com', True, True)), first[0][1:])
+
+    def test_progress(self):
+        reports = []
+        stats = {}
+        with mock.patch('is_email._check_dns', side_effect=self.check_dns):
+            list(is_email_bulk(['a@example.com', 'b@example.com', 'c@example.org', 'd@', 'e@example.org'], chunksize=2, stats=stats, progress=lambda stats: reports.append(dict(stats))))
+        self.assertEqual([report['addresses'] for report in reports], [2, 4, 5])
+        self.assertEqual([report['domains'] for report in reports], [1, 2, 2])
+        self.assertEqual(stats['dns_addresses'], 4)
+
+class TestFastPath(ParserAgreement, unittest.TestCase):
+
+    def setUp(self):
+        self.addresses = [decode_email(address) for address in load_addresses()]
+        # Addresses either side of each length limit
+        self.addresses += [
+            'a' * 64 + '@example.com',
+            'a' * 65 + '@example.com',
+            'a@' + 'b' * 63 + '.com',
+            'a@' + 'b' * 64 + '.com',
+            'a@' + '.'.join(['b' * 63] * 3) + '.' + 'c' * 61,
+            'a@' + '.'.join(['b' * 63] * 3) + '.' + 'c' * 62,
+            'a@b-c.d', 'a@b-.c', 'a@-b.c', 'a@b.123', 'a@123', 'a.b.c@d', "!#$%&'*+-/=?^_`{|}~@example.com",
+        ]
+
+    def test_fast_path_agrees_with_parser(self):
+        self.assertGreater(self.assertAgreesWithParser(_parse_fast, self.addresses), 0)
+
+class TestAddressLiteral(ParserAgreement, unittest.TestCase):
+
+    def setUp(self):
+        self.addresses = [decode_email(address) for address in load_addresses()]
+        # Literals either side of each length limit, and of each IPv6 rule
+        self.addresses += [
+            'a' * 64 + '@[10.0.0.1]',
+            'a' * 65 + '@[10.0.0.1]',
+            'a@[' + '1' * 61 + ']',
+            'a@[' + '1' * 62 + ']',
+            'a' * 64 + '@[IPv6:' + ':'.join(['ffff'] * 6) + ':255.255.255.255]',
+            'a@[]', 'a@[10.0.0.256]', 'a@[1.10.0.0.1]', 'a@[ipv6:1::2]', 'a@[IPv6:1::2::3]', 'a@[IPv6::1]', 'a@[IPv6:1:]',
+            'a@[IPv6:1:2:3:4:5:6:7]', 'a@[IPv6:1:2:3:4:5:6:7:8:9]', 'a@[IPv6:1::3:4:5:6:7:8]', 'a@[IPv6::2:3:4:5:6:7:8]',
+            'a@[IPv6:1:2:3:4:5:6:1.2.3.4]', 'a@[IPv6:fffff::1]', 'a@[IPv6:g::1]', 'a@[tag:content]', 'a.b@[10.0.0.1]',
+        ]
+
+    def test_literal_path_agrees_with_parser(self):
+        self.assertGreater(self.assertAgreesWithParser(_parse_literal, self.addresses), 20)
+
+    def test_check_address_literal(self):
+        self.assertEqual(_check_address_literal('10.0.0.1'), (ISEMAIL_RFC5321_ADDRESSLITERAL,))
+        self.assertEqual(_check_address_literal('IPv6:1::2::3'), (ISEMAIL_RFC5322_IPV6_2X2XCOLON, ISEMAIL_RFC5321_ADDRESSLITERAL))
+        self.assertEqual(_check_address_literal('IPv6::1'), (ISEMAIL_RFC5322_IPV6_GRPCOUNT, ISEMAIL_RFC5322_IPV6_COLONSTRT, ISEMAIL_RFC5321_ADDRESSLITERAL))
+        self.assertEqual(_check_address_literal('IPv6:1:2:3:4:5:6:7:g'), (ISEMAIL_RFC5322_IPV6_BADCHAR,))
+        self.assertEqual(_check_address_literal('tag:content'), (ISEMAIL_RFC5322_DOMAINLITERAL,))
+
+class TestDFAEngine(ParserAgreement, unittest.TestCase):
+
+    def fuzzed_addresses(self, count):
+        # Mostly addresses the DFA decides, with the odd character that it doesn't
+        rng = random.Random(0)
+        def noisy(text):
+            if rng.random() < 0.1:
+                position = rng.randint(0, len(text))
+                text = text[:position] + rng.choice(['', '-', '(', '[', '"', '\\', '\r\n ', '\x00', 'é']) + text[position:]
+            return text
+        def element():
+            if rng.random() < 0.4:
+                return noisy('"' + ''.join(rng.choices(['a', ' ', '.', '@', '(', '\\"', '\\\t', '\x01', '\t'], k=rng.randint(0, 6))) + '"')
+            return noisy(''.join(rng.choices('az09-_#', k=rng.randint(1, 70 if rng.random() < 0.1 else 5))))
+        def label():
+            return noisy(''.join(rng.choices('az09_', k=rng.randint(1, 70 if rng.random() < 0.1 else 8))))
+        return [
+            '.'.join(element() for _ in range(rng.randint(1, 3))) + '@' + '.'.join(label() for _ in range(rng.randint(1, 5)))
+            for _ in range(count)
+        ]
+
+    def test_agrees_with_parser(self):
+        addresses = [decode_email(address) for address in load_addresses()] + self.fuzzed_addresses(5000)
+        self.assertGreater(self.assertAgreesWithParser(_parse_dfa, addresses), 1000)
+
+    def test_engine_argument(self):
+        for address in load_addresses():
+            self.assertEqual(is_email(address, False, True, engine='dfa'), is_email(address, False, True), address)
+        self.assertIsNotNone(_parse_dfa('"first\\"last"@iana.org'))
+        with self.assertRaises(ValueError):
+            is_email('test@iana.org', engine='regex')
+
+class TestDecode(unittest.TestCase):
+
+    def test_decode_email(self):
+        self.assertEqual(decode_email('test&#64;iana.org'), 'test@iana.org')
+        self.assertEqual(decode_email('"\u2400\u2407\u2409\u240A\u240D"@iana.org'), '"\0\7\t\n\r"@iana.org')
+        self.assertEqual(decode_email('&#x2409;@iana.org'), '\t@iana.org')  # Entities are decoded first
+        self.assertEqual(decode_email('jörg@iana.org'), 'jörg@iana.org')
+
+    def test_decode_false(self):
+        self.assertEqual(is_email('test&#64;iana.org', False, True), ISEMAIL_VALID)
+        self.assertEqual(is_email('test&#64;iana.org', False, True, decode=False), ISEMAIL_ERR_EXPECTING_ATEXT)
+        self.assertNotEqual(ResultCache.key('test&#64;iana.org'), ResultCache.key('test&#64;iana.org', decode=False))
+
+class TestBytesInput(unittest.TestCase):
+
+    def test_matches_str(self):
+        for address in load_addresses():
+            text = decode_email(address)
+            if not text.isascii():
+                continue
+            for email in (text.encode(), bytearray(text.encode()), memoryview(text.encode())):
+                self.assertEqual(is_email(email, False, True), is_email(address, False, True), address)
+
+    def test_not_html_decoded(self):
+        self.assertEqual(is_email('test&#64;iana.org', False, True), ISEMAIL_VALID)
+        self.assertEqual(is_email(b'test&#64;iana.org', False, True), ISEMAIL_ERR_EXPECTING_ATEXT)  # ';' isn't atext
+
+    def test_non_ascii_policy(self):
+        email = '"jörg"@iana.org'.encode('utf-8')
+        self.assertEqual(is_email(email, False, True), ISEMAIL_ERR_EXPECTING_QTEXT)
+        self.assertEqual(is_email(email, False, True, non_ascii='utf-8'), ISEMAIL_ERR_EXPECTING_QTEXT)
+        # Parsing stops at the first character that isn't qtext
+        self.assertEqual(validate(email, False, True).local_part, '"j\xc3')  # One character per octet
+        self.assertEqual(validate(email, False, True, non_ascii='utf-8').local_part, '"jö')
+        with self.assertRaises(UnicodeDecodeError):
+            is_email(email, non_ascii='strict')
+        with self.assertRaises(ValueError):
+            is_email(email, non_ascii='latin-2')
+
+    def test_cache_key(self):
+        self.assertEqual(ResultCache.key(memoryview(b'Test@iana.org')), ResultCache.key(b'test@iana.org'))
+        self.assertNotEqual(ResultCache.key(b'test@iana.org'), ResultCache.key('test@iana.org'))
+        self.assertNotEqual(ResultCache.key('jörg@iana.org'.encode()), ResultCache.key('jörg@iana.org'.encode(), non_ascii='utf-8'))
+
+class TestOversizedInput(unittest.TestCase):
+
+    # Diagnosed as the parser would diagnose them
+    ADDRESSES = [
+        'a' * 5000,
+        'a.' * 2500,
+        "!#$%'*+/=?^_`{|}~-" * 300,
+        'a' * 5000 + '@iana.org',
+        'test@' + 'a' * 5000,
+        'test@' + 'a.' * 2500 + 'org',
+        'test@' + ('a' * 70 + '.') * 60 + 'org',
+        'a.' * 2500 + 'a@iana.org',
+    ]
+
+    # Rejected without being parsed
+    REJECTED = [
+        '.' + 'a' * 5000,
+        'a..' + 'a' * 5000,
+        '@' + 'a' * 5000,
+        '"' + 'a' * 5000 + '@x.com',
+        '.' + 'a' * 5000 + '@x.com',
+        'a' * 5000 + '.@x.com',
+        'a' * 5000 + '@-x.com',
+        'a' * 5000 + '@x..com',
+        'a ' * 3000,
+        '(' + 'a' * 5000 + ')a@x.com',
+        '(' * 5000 + '@',
+        '&amp;' * 1000 + '@x.com',
+        'a@b@' + 'c' * 5000,
+        'a' * 5000 + '\u00e9@x.com',
+    ]
+
+    # Shapes that would take the parser a second or so each
+    HOSTILE = [
+        'a' * 1000000,
+        '(' + 'a' * 1000000 + ')a@b.com',
+        '"' + 'a' * 1000000 + '"@b.com',
+        ' \r\n' * 300000 + 'a@b.com',
+        '&amp;' * 200000,
+        '@' * 1000000,
+    ]
+
+    def test_matches_parser(self):
+        for address in self.ADDRESSES:
+            with self.subTest(address=address[:10]):
+                with mock.patch.object(is_email_module, 'ISEMAIL_MAX_INPUT_LENGTH', 10000):
+                    expected = validate(address, False, True)
+                    statuses = [is_email(address, False, errorlevel) for errorlevel in (False, 18)]
+                self.assertEqual(validate(address, False, True).diagnoses, expected.diagnoses)
+                self.assertEqual(is_email(address.encode(), False, True), expected.status)
+                self.assertEqual([is_email(address, False, errorlevel) for errorlevel in (False, 18)], statuses)
+
+    def test_rejected(self):
+        for address in self.REJECTED:
+            with self.subTest(address=address[:10]):
+                self.assertEqual(validate(address, False, True).diagnoses, (ISEMAIL_ERR_INPUT_TOOLONG,))
+                self.assertEqual(is_email(address.encode('utf-8'), False, True), ISEMAIL_ERR_INPUT_TOOLONG)
+                self.assertIs(is_email(address), False)
+
+    def test_not_parsed(self):
+        with mock.patch.object(is_email_module, '_parse_full') as parse_full, mock.patch.object(is_email_module, 'decode_email') as decode:
+            self.assertEqual(is_email('a' * 500000 + '@iana.org', False, True), ISEMAIL_RFC5322_LOCAL_TOOLONG)
+            self.assertEqual(is_email(b'test@' + b'a.' * 250000 + b'org', False, True), ISEMAIL_RFC5322_DOMAIN_TOOLONG)
+            for address in self.HOSTILE:
+                is_email(address, True, True)
+        parse_full.assert_not_called()
+        decode.assert_not_called()
+
+    def test_hostile_inputs_bounded(self):
+        for address in self.HOSTILE:
+            with self.subTest(address=address[:10]):
+                start = time.perf_counter()
+                self.assertIn(is_email(address, True, True), (ISEMAIL_ERR_NODOMAIN, ISEMAIL_ERR_INPUT_TOOLONG))
+                self.assertLess(time.perf_counter() - start, 0.1)
+
+    def test_no_dns_check(self):
+        with mock.patch.object(is_email_module, '_check_dns') as check_dns:
+            self.assertEqual(is_email('test@' + 'a' * 5000, True, True), ISEMAIL_RFC5322_DOMAIN_TOOLONG)
+        check_dns.assert_not_called()
+
+class TestLinearTime(unittest.TestCase):
+
+    # Addresses with n comments or folds, far past ISEMAIL_MAX_INPUT_LENGTH
+    # for the larger n, so the limit is lifted to reach the parser
+    SHAPES = {
+        'nested comments': lambda n: '(' * n + ')' * n + 'a@iana.org',
+        'comments': lambda n: '(a)' * n + 'a@iana.org',
+        'folds in local part': lambda n: '\r\n ' * n + 'a@iana.org',
+        'folds in domain': lambda n: 'a@' + '\r\n ' * n + 'iana.org',
+    }
+
+    def setUp(self):
+        patcher = mock.patch.object(is_email_module, 'ISEMAIL_MAX_INPUT_LENGTH', 10 ** 9)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def check(self, address):
+        """(status, parsedata['status'], fastest of three timings)"""
+        timings = []
+        for _ in range(3):
+            parsedata = {}
+            start = time.perf_counter()
+            status = is_email(address, False, True, parsedata)
+            timings.append(time.perf_counter() - start)
+        return status, parsedata['status'], min(timings)
+
+    def test_linear(self):
+        for name, shape in self.SHAPES.items():
+            with self.subTest(name):
+                expected = self.check(shape(10))
+                small = self.check(shape(10000))
+                large = self.check(shape(100000))
+                for result in (small, large):
+                    self.assertEqual(result[:2], expected[:2])
+                    self.assertEqual(len(result[1]), len(set(result[1])))
+                # Ten times the input should take about ten times as long; a
+                # parser that is quadratic anywhere takes a hundred times
+                self.assertLess(large[2] / small[2], 30)
+
+class FakeAnswer:
+
+    def __init__(self, ttl):
+        self.rrset = mock.Mock(ttl=ttl)
+
+class TestDNSCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = DNSCache(maxsize=2, negative_ttl=60, clock=lambda: self.now)
+        patcher = mock.patch.object(is_email_module, 'dns_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_answers_cached_for_ttl(self):
+        with mock.patch('dns.resolver.resolve', return_value=FakeAnswer(300)) as resolve:
+            for _ in range(3):
+                self.assertEqual(is_email('a@example.com', True, True), ISEMAIL_VALID)
+            self.assertEqual(resolve.call_count, 1)
+            self.now += 301
+            is_email('a@example.com', True, True)
+            self.assertEqual(resolve.call_count, 2)
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_negative_answers_cached(self):
+        with mock.patch('dns.resolver.resolve', side_effect=dns.resolver.NXDOMAIN) as resolve:
+            for _ in range(3):
+                self.assertEqual(is_email('a@example.invalid', True, True), ISEMAIL_DNSWARN_NO_RECORD)
+            self.assertEqual(resolve.call_count, 1)
+            self.now += 61
+            is_email('a@example.invalid', True, True)
+            self.assertEqual(resolve.call_count, 2)
+
+    def test_lru_eviction(self):
+        with mock.patch('dns.resolver.resolve', return_value=FakeAnswer(300)) as resolve:
+            for domain in ('a.com', 'b.com', 'a.com', 'c.com', 'a.com', 'b.com'):
+                is_email('x@' + domain, True, True)
+            self.assertEqual(resolve.call_count, 4)
+        self.assertEqual(self.cache.evictions, 2)
+        self.assertEqual(len(self.cache), 2)
+
+class TestResolverConfig(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(is_email_module, 'dns_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def check(self, config, side_effect):
+        with mock.patch.object(is_email_module, 'resolver_config', config), \
+             mock.patch('dns.resolver.resolve', side_effect=side_effect) as resolve, \
+             mock.patch('time.sleep') as sleep:
+            result = validate('a@example.com', True, True)
+        return result.diagnoses, resolve.call_count, [call.args[0] for call in sleep.call_args_list]
+
+    def test_backoff(self):
+        timeout = dns.exception.Timeout
+        diagnoses, queries, sleeps = self.check(ResolverConfig(backoff=0.1), [timeout, timeout, FakeAnswer(300)])
+        self.assertEqual(diagnoses, (ISEMAIL_VALID,))
+        self.assertEqual(queries, 3)
+        self.assertEqual(sleeps, [0.1, 0.2])
+
+    def test_indeterminate(self):
+        diagnoses, queries, _ = self.check(ResolverConfig(retries=2), dns.exception.Timeout)
+        self.assertEqual(diagnoses, (ISEMAIL_DNSWARN_INDETERMINATE,))
+        self.assertEqual(queries, 3)
+        # A timeout looking for other records is indeterminate too, rather than an exception
+        diagnoses, _, _ = self.check(ResolverConfig(retries=0), [dns.resolver.NoAnswer, dns.exception.Timeout])
+        self.assertEqual(diagnoses, (ISEMAIL_DNSWARN_INDETERMINATE, ISEMAIL_DNSWARN_NO_MX_RECORD))
+
+    def test_lifetime(self):
+        diagnoses, queries, sleeps = self.check(ResolverConfig(lifetime=1, backoff=2), dns.exception.Timeout)
+        self.assertEqual(diagnoses, (ISEMAIL_DNSWARN_INDETERMINATE,))
+        self.assertEqual((queries, sleeps), (1, []))
+
+    def test_indeterminate_not_cached(self):
+        cache = ResultCache()
+        with mock.patch.object(is_email_module, 'resolver_config', ResolverConfig(retries=0)), \
+             mock.patch('dns.resolver.resolve', side_effect=dns.exception.Timeout):
+            self.assertEqual(is_email('a@example.com', True, True, cache=cache), ISEMAIL_DNSWARN_INDETERMINATE)
+        self.assertEqual(len(cache), 0)
+
+    def records(self, *rdtypes, missing=dns.resolver.NoAnswer):
+        def resolve(name, rdtype, **kwargs):
+            if rdtype not in rdtypes:
+                raise missing
+            return FakeAnswer(300)
+        return resolve
+
+    def test_record_types(self):
+        config = ResolverConfig()
+        for rdtypes, diagnoses, record in [
+            (('MX', 'A'), (ISEMAIL_VALID,), 'MX'),
+            (('A',), (ISEMAIL_DNSWARN_NO_MX_RECORD,), 'A'),
+            (('CNAME',), (ISEMAIL_DNSWARN_NO_MX_RECORD,), 'CNAME'),
+            ((), (ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN_NO_RECORD), None),
+        ]:
+            with mock.patch.object(is_email_module, 'resolver_config', config), mock.patch('dns.resolver.resolve', side_effect=self.records(*rdtypes)):
+                result = validate('a@example.com', True, True)
+            self.assertEqual((result.diagnoses, result.dns_record), (diagnoses, record), rdtypes)
+
+    def test_concurrent(self):
+        config = ResolverConfig('concurrent')
+        for rdtypes, diagnoses, record in [
+            (('MX', 'A', 'AAAA'), (ISEMAIL_VALID,), 'MX'),
+            (('AAAA',), (ISEMAIL_DNSWARN_NO_MX_RECORD,), 'AAAA'),
+            (('CNAME',), (ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN_NO_RECORD), None),  # A CNAME alone isn't enough
+        ]:
+            with mock.patch.object(is_email_module, 'resolver_config', config), \
+                 mock.patch('dns.resolver.resolve', side_effect=self.records(*rdtypes)) as resolve:
+                result = validate('a@example.com', True, True)
+            self.assertEqual((result.diagnoses, result.dns_record), (diagnoses, record), rdtypes)
+            self.assertLessEqual({call.args[1] for call in resolve.call_args_list}, {'MX', 'A', 'AAAA'})
+
+        with mock.patch.object(is_email_module, 'resolver_config', config), \
+             mock.patch('dns.resolver.resolve', side_effect=self.records('A', missing=dns.resolver.NXDOMAIN)):
+            self.assertEqual(validate('a@example.invalid', True, True).diagnoses, (ISEMAIL_DNSWARN_NO_RECORD,))
+
+    def test_concurrent_async(self):
+        async def resolve(name, rdtype, **kwargs):
+            if rdtype == 'MX':
+                await asyncio.sleep(0.01)
+                raise dns.resolver.NoAnswer
+            return FakeAnswer(300)
+
+        with mock.patch.object(is_email_module, 'resolver_config', ResolverConfig('concurrent')), \
+             mock.patch('dns.asyncresolver.resolve', side_effect=resolve):
+            self.assertEqual(asyncio.run(is_email_async('a@example.com', True, True)), ISEMAIL_DNSWARN_NO_MX_RECORD)
+
+    def test_concurrent_verdict_waits_for_mx(self):
+        is_email_module._load_dns()
+        self.assertIsNone(is_email_module._concurrent_verdict({'A': True}))
+        self.assertEqual(is_email_module._concurrent_verdict({'A': True, 'MX': dns.resolver.NoAnswer()}), (False, (ISEMAIL_DNSWARN_NO_MX_RECORD,), 'A'))
+        self.assertIsNone(is_email_module._concurrent_verdict({'A': dns.resolver.NoAnswer(), 'MX': dns.resolver.NoAnswer()}))
+
+    def test_nameservers(self):
+        resolver = ResolverConfig(nameservers=['192.0.2.1'], timeout=0.5).resolver()
+        self.assertEqual(resolver.nameservers, ['192.0.2.1'])
+        self.assertEqual(resolver.timeout, 0.5)
+        self.assertIsNone(ResolverConfig().resolver())
+
+class TestFixtureResolver(unittest.TestCase):
+
+    # (domain, diagnoses and record with the cascade, the same with the concurrent strategy)
+    EXPECTED = [
+        ('mx.example', ((ISEMAIL_VALID,), 'MX'), ((ISEMAIL_VALID,), 'MX')),
+        ('a-only.example', ((ISEMAIL_DNSWARN_NO_MX_RECORD,), 'A'), ((ISEMAIL_DNSWARN_NO_MX_RECORD,), 'A')),
+        ('aaaa-only.example', ((ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN_NO_RECORD), None), ((ISEMAIL_DNSWARN_NO_MX_RECORD,), 'AAAA')),
+        ('alias.example', ((ISEMAIL_VALID,), 'MX'), ((ISEMAIL_VALID,), 'MX')),
+        ('dangling.example', ((ISEMAIL_DNSWARN_NO_RECORD,), None), ((ISEMAIL_DNSWARN_NO_RECORD,), None)),
+        ('empty.example', ((ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN_NO_RECORD), None), ((ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN_NO_RECORD), None)),
+        ('timeout.example', ((ISEMAIL_DNSWARN_INDETERMINATE,), None), ((ISEMAIL_DNSWARN_INDETERMINATE,), None)),
+        ('lame.example', ((ISEMAIL_DNSWARN_NO_RECORD,), None), ((ISEMAIL_DNSWARN_NO_RECORD,), None)),
+        ('missing.example', ((ISEMAIL_DNSWARN_NO_RECORD,), None), ((ISEMAIL_DNSWARN_NO_RECORD,), None)),
+    ]
+
+    def setUp(self):
+        patcher = mock.patch.object(is_email_module, 'dns_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def configure(self, backend, strategy='cascade', **kwargs):
+        patcher = mock.patch.object(is_email_module, 'resolver_config', ResolverConfig(strategy, backend=backend, **kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tests_xml(self):
+        self.configure(FixtureResolver.load('./tests/dns_fixture.json'))
+        for test in ET.parse('./tests/tests.xml').getroot().findall('test'):
+            address = test.find('address').text or ""
+            self.assertEqual(result_codes[is_email(address, True, True)], test.find('diagnosis').text, address)
+
+    def test_strategies(self):
+        backend = FixtureResolver.load('./tests/dns_fixture.json')
+        for index, strategy in enumerate(('cascade', 'concurrent'), 1):
+            with mock.patch.object(is_email_module, 'resolver_config', ResolverConfig(strategy, backend=backend, retries=0)):
+                for expected in self.EXPECTED:
+                    result = validate('test@' + expected[0], True, True)
+                    self.assertEqual((result.diagnoses, result.dns_record), expected[index], (strategy, expected[0]))
+
+    def test_latency_and_failures(self):
+        backend = FixtureResolver.load('./tests/dns_fixture.json', latency=lambda name, rdtype: 0.5 if rdtype == 'MX' else 0.0)
+        self.configure(backend, lifetime=0.1, retries=0)
+        with mock.patch('time.sleep') as sleep:
+            self.assertEqual(is_email('test@mx.example', True, True), ISEMAIL_DNSWARN_INDETERMINATE)
+        self.assertEqual(backend.queries, [('mx.example', 'MX')])
+        self.assertLessEqual(sleep.call_args.args[0], 0.1)
+
+        self.configure(FixtureResolver.load('./tests/dns_fixture.json', failure_rate=1.0), retries=2)
+        self.assertEqual(is_email('test@mx.example', True, True), ISEMAIL_DNSWARN_INDETERMINATE)
+        self.assertEqual(len(is_email_module.resolver_config.backend.queries), 3)
+
+    def test_config_swapped_during_check(self):
+        first = FixtureResolver({'x.example': {'A': ['192.0.2.1']}})
+        second = FixtureResolver({})
+        self.configure(first)
+        resolve = first.resolve
+
+        def swap(name, rdtype, **kwargs):
+            is_email_module.resolver_config = ResolverConfig(backend=second)
+            return resolve(name, rdtype, **kwargs)
+
+        first.resolve = swap
+        self.assertEqual(is_email('test@x.example', True, True), ISEMAIL_DNSWARN_NO_MX_RECORD)
+        self.assertEqual(first.queries, [('x.example', 'MX'), ('x.example', 'A')])
+        self.assertEqual(second.queries, [])
+
+    def test_bulk_concurrency(self):
+        domains = [f'domain{i}.example' for i in range(50)]
+        self.configure(FixtureResolver({domain: {'MX': ['10 mail.example.']} for domain in domains}), 'concurrent')
+        results = list(is_email_bulk(['test@' + domain for domain in domains], True, concurrency=50))
+        self.assertEqual({status for _, status, _ in results}, {ISEMAIL_VALID})
+        self.assertGreaterEqual(is_email_module._executor_workers, 3 * 50)
+
+    def test_replaced_pool_shut_down(self):
+        self.configure(FixtureResolver.load('./tests/dns_fixture.json'), 'concurrent')
+        is_email('test@mx.example', True, True)
+        old = is_email_module._dns_executor()
+        new = is_email_module._dns_executor(is_email_module._executor_workers + 1)
+        self.assertIsNot(new, old)
+        with self.assertRaises(RuntimeError):
+            old.submit(int)
+        self.assertEqual(is_email('test@a-only.example', True, True), ISEMAIL_DNSWARN_NO_MX_RECORD)
+
+    def test_cached_queries(self):
+        backend = FixtureResolver.load('./tests/dns_fixture.json')
+        self.configure(backend)
+        with mock.patch.object(is_email_module, 'dns_cache', DNSCache()):
+            for _ in range(3):
+                is_email('test@a-only.example', True, True)
+        self.assertEqual(backend.queries, [('a-only.example', 'MX'), ('a-only.example', 'A')])
+
+    def test_asynchronous(self):
+        self.configure(FixtureResolver.load('./tests/dns_fixture.json', latency=0.01, asynchronous=True), 'concurrent')
+        addresses = ['test@mx.example', 'test@aaaa-only.example', 'test@missing.example']
+
+        async def collect():
+            return [status async for _, status, _ in is_email_many_async(addresses, True, True)]
+
+        self.assertEqual(asyncio.run(collect()), [ISEMAIL_VALID, ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN_NO_RECORD])
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics()
+        self.backend = FixtureResolver.load('./tests/dns_fixture.json')
+        for name, value in (('instrumentation', self.metrics), ('dns_cache', DNSCache()), ('resolver_config', ResolverConfig(backend=self.backend, retries=1))):
+            patcher = mock.patch.object(is_email_module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_partial_hooks(self):
+        class Results(Instrumentation):
+            def result(self, diagnosis, category):
+                diagnoses.append((diagnosis, category))
+
+        diagnoses = []
+        with mock.patch.object(is_email_module, 'instrumentation', Results()):
+            is_email('test@a-only.example', True, True)
+        self.assertEqual(diagnoses, [(ISEMAIL_DNSWARN_NO_MX_RECORD, ISEMAIL_DNSWARN)])
+
+    def test_phases_and_categories(self):
+        for email in ('test@iana.org', 'test@[IPv6:1::2:]', '"test test"@iana.org', '@iana.org', 'x' * 5000 + '@iana.org'):
+            validate(email, errorlevel=True)
+        stats = self.metrics.stats()
+        self.assertEqual(stats['phases']['decode']['count'], 4)
+        self.assertEqual(stats['phases']['parse']['count'], 5)
+        self.assertNotIn('dns', stats['phases'])
+        self.assertEqual(stats['categories'], {ISEMAIL_VALID_CATEGORY: 1, ISEMAIL_RFC5322: 2, ISEMAIL_ERR: 1, ISEMAIL_RFC5321: 1})
+
+    def test_same_results(self):
+        addresses = load_addresses()
+        for engine in ('parser', 'dfa'):
+            results = [validate(address, errorlevel=True, engine=engine).diagnoses for address in addresses]
+            with mock.patch.object(is_email_module, 'instrumentation', None):
+                self.assertEqual(results, [validate(address, errorlevel=True, engine=engine).diagnoses for address in addresses])
+
+    def test_dns_queries_and_retries(self):
+        for _ in range(2):
+            is_email('test@a-only.example', True, True)
+        is_email('test@timeout.example', True, True)
+        stats = self.metrics.stats()
+        self.assertEqual(stats['phases']['dns']['count'], 3)
+        self.assertEqual(stats['dns_queries'], {'MX': 3, 'A': 1})
+        self.assertEqual(stats['dns_errors'], {'NoAnswer': 1, 'Timeout': 2})
+        self.assertEqual(stats['dns_retries'], {'MX': 1})
+        self.assertEqual(stats['cache_hits'], {'dns': 2})
+        self.assertEqual(stats['cache_misses'], {'dns': 4})
+        self.assertEqual(stats['categories'], {ISEMAIL_DNSWARN: 3})
+
+    def test_caches(self):
+        cache = ResultCache()
+        with mock.patch.object(is_email_module, 'domain_store', DomainStore(':memory:')):
+            for _ in range(2):
+                list(is_email_many(['a@mx.example', 'b@mx.example'], True, True, cache=cache))
+        stats = self.metrics.stats()
+        self.assertEqual(stats['cache_hits'], {'result': 2})
+        self.assertEqual(stats['cache_misses'], {'result': 2, 'store': 1, 'dns': 1})
+        self.assertEqual(stats['categories'], {ISEMAIL_VALID_CATEGORY: 2})
+
+    def test_asynchronous(self):
+        self.backend.asynchronous = True
+        asyncio.run(is_email_async('test@mx.example', True, True))
+        self.assertEqual(self.metrics.stats()['dns_queries'], {'MX': 1})
+
+class TestDomainStore(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'verdicts.db')
+        self.store = self.open_store()
+        for name, value in (('dns_cache', None), ('domain_store', self.store)):
+            patcher = mock.patch.object(is_email_module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def open_store(self):
+        store = DomainStore(self.path, ttl=600, negative_ttl=60, clock=lambda: self.now)
+        self.addCleanup(store.close)
+        return store
+
+    def test_verdicts_shared(self):
+        with mock.patch('dns.resolver.resolve', return_value=FakeAnswer(300)) as resolve:
+            self.assertEqual(is_email('a@example.com', True, True), ISEMAIL_VALID)
+            with mock.patch.object(is_email_module, 'domain_store', self.open_store()):
+                self.assertEqual(is_email('b@Example.com', True, True), ISEMAIL_VALID)
+            self.assertEqual(resolve.call_count, 1)
+
+    def test_verdicts_expire(self):
+        with mock.patch('dns.resolver.resolve', side_effect=dns.resolver.NXDOMAIN) as resolve:
+            self.assertEqual(is_email('a@example.invalid', True, True), ISEMAIL_DNSWARN_NO_RECORD)
+            self.assertEqual(self.store.get('example.invalid'), (False, (ISEMAIL_DNSWARN_NO_RECORD,), None))
+            self.now += 61
+            self.assertIsNone(self.store.get('example.invalid'))
+            self.assertEqual(is_email('a@example.invalid', True, True), ISEMAIL_DNSWARN_NO_RECORD)
+            self.assertEqual(resolve.call_count, 2)
+
+    def test_timeouts_not_stored(self):
+        with mock.patch('dns.resolver.resolve', side_effect=dns.exception.Timeout):
+            is_email('a@example.com', True, True)
+        self.assertEqual(len(self.store), 0)
+
+    def test_preload_and_compact(self):
+        self.store.preload({'a.com': (True, (), 'MX'), 'b.com': (False, (ISEMAIL_DNSWARN_NO_RECORD,), None)})
+        other = DomainStore(':memory:')
+        other.preload(self.store.items())
+        self.assertEqual(other.get('a.com'), (True, (), 'MX'))
+        self.now += 61
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(self.store.compact(), 1)
+        self.assertEqual(self.store.items(), [('a.com', (True, (), 'MX'))])
+
+    def test_old_schema(self):
+        import sqlite3
+        path = os.path.join(os.path.dirname(self.path), 'old.db')
+        with contextlib.closing(sqlite3.connect(path)) as connection, connection:
+            connection.execute('CREATE TABLE verdicts (domain TEXT PRIMARY KEY, dns_checked INTEGER NOT NULL, codes TEXT NOT NULL, expires REAL NOT NULL)')
+            connection.execute("INSERT INTO verdicts VALUES ('a.com', 1, '', 2000.0)")
+        store = DomainStore(path, clock=lambda: self.now)
+        self.addCleanup(store.close)
+        self.assertEqual(store.get('a.com'), (True, (), None))
+        store.put('b.com', (False, (ISEMAIL_DNSWARN_NO_MX_RECORD,), 'A'))
+        self.assertEqual(store.get('b.com'), (False, (ISEMAIL_DNSWARN_NO_MX_RECORD,), 'A'))
+        self.assertEqual(len(store), 2)
+
+    def test_other_process(self):
+        code = f'import is_email; is_email.DomainStore({self.path!r}).put("a.com", (True, (), "MX"))'
+        subprocess.run([sys.executable, '-c', code], check=True)
+        self.now = time.time()
+        self.assertEqual(self.store.get('a.com'), (True, (), 'MX'))
+
+class TestResultCache(unittest.TestCase):
+
+    def test_cached_results_match(self):
+        cache = ResultCache()
+        addresses = load_addresses()
+        for _ in range(2):
+            for address in addresses:
+                self.assertEqual(is_email(address, False, True, cache=cache), is_email(address, False, True))
+        self.assertEqual(cache.hits + cache.misses, 2 * len(addresses))
+        self.assertGreaterEqual(cache.stats()['hit_rate'], 0.5)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_key(self):
+        self.assertEqual(ResultCache.key('Test@IANA.org'), ResultCache.key('test@iana.org'))
+        self.assertEqual(ResultCache.key('test@iana.org', False, E_WARNING), ResultCache.key('test@iana.org', False, ISEMAIL_THRESHOLD))
+        self.assertNotEqual(ResultCache.key('test@iana.org', True), ResultCache.key('test@iana.org', False))
+        # Entity names and non-ASCII characters can change meaning with case
+        self.assertNotEqual(ResultCache.key('a&Tab;b@iana.org'), ResultCache.key('a&tab;b@iana.org'))
+        self.assertNotEqual(ResultCache.key('\u212a@iana.org'), ResultCache.key('k@iana.org'))
+
+    def test_dns_results_expire(self):
+        now = [0.0]
+        cache = ResultCache(dns_ttl=60, clock=lambda: now[0])
+        with mock.patch.object(is_email_module, '_check_dns', return_value=(True, (), 'MX')) as check_dns:
+            results = [status for _, status, _ in is_email_many(['a@iana.org', 'A@iana.org', 'b@'], True, True, cache=cache)]
+            self.assertEqual(results, [ISEMAIL_VALID, ISEMAIL_VALID, ISEMAIL_ERR_NODOMAIN])
+            is_email('a@iana.org', False, True, cache=cache)
+            now[0] = 61
+            is_email('a@iana.org', True, True, cache=cache)
+            is_email('a@iana.org', False, True, cache=cache)
+        self.assertEqual(check_dns.call_count, 2)
+        self.assertEqual(cache.hits, 2)
+
+class TestValidate(unittest.TestCase):
+
+    def test_components(self):
+        result = validate('"first last"@[IPv6:1111:2222:3333::4444:5555:6666]', False, True)
+        self.assertEqual(result.local_part, '"first last"')
+        self.assertEqual(result.domain, '[IPv6:1111:2222:3333::4444:5555:6666]')
+        self.assertEqual(result.literal, 'IPv6:1111:2222:3333::4444:5555:6666')
+        self.assertEqual(result.status, ISEMAIL_RFC5321_ADDRESSLITERAL)
+        self.assertEqual(result.diagnoses, (ISEMAIL_RFC5321_QUOTEDSTRING, ISEMAIL_RFC5321_ADDRESSLITERAL))
+
+        result = validate('first.last@sub.iana.org')
+        self.assertIs(result.status, True)
+        self.assertEqual(result.local_atoms, ['first', 'last'])
+        self.assertEqual(result.domain_atoms, ['sub', 'iana', 'org'])
+        self.assertIsNone(result.literal)
+        self.assertEqual(result.diagnoses, (ISEMAIL_VALID,))
+
+    def test_components_skip_cfws(self):
+        result = validate('(comment)"a\\"b\r\n c".d@(x)[1.2.3.4\r\n ]', False, True)
+        self.assertEqual(result.local_part, '"a\\"b c".d')
+        self.assertEqual(result.local_atoms, ['"a\\"b c"', 'd'])
+        self.assertEqual(result.domain, '[1.2.3.4]')
+        self.assertEqual(result.domain_atoms, ['[1.2.3.4]'])
+        self.assertEqual(result.literal, '1.2.3.4')
+
+    def test_matches_is_email(self):
+        for address in load_addresses():
+            parsedata = {}
+            status = is_email(address, False, True, parsedata)
+            result = validate(address, False, True)
+            self.assertEqual(result.status, status)
+            self.assertEqual(list(result.diagnoses), parsedata['status'])
+            self.assertEqual(result.domain, parsedata[ISEMAIL_COMPONENT_DOMAIN])
+
+class TestValidateParallel(unittest.TestCase):
+
+    def test_matches_is_email_in_order(self):
+        addresses = load_addresses()
+        for errorlevel in (True, False):
+            stats = {}
+            results = list(validate_parallel(addresses, False, errorlevel, workers=2, chunksize=16, stats=stats))
+            self.assertEqual(results, [(address, is_email(address, False, errorlevel)) for address in addresses])
+            self.assertEqual(sum(worker['addresses'] for worker in stats.values()), len(addresses))
+
+    def test_spawned_workers_share_dns_settings(self):
+        code = (
+            'import multiprocessing, is_email\n'
+            'multiprocessing.set_start_method("spawn")\n'
+            'is_email.dns_cache = is_email.DNSCache(maxsize=5)\n'
+            'is_email.resolver_config = is_email.ResolverConfig("concurrent", backend=is_email.FixtureResolver.load("tests/dns_fixture.json"))\n'
+            'print(list(is_email.validate_parallel(["a@a-only.example", "a@aaaa-only.example"], True, True, workers=1)))\n'
+        )
+        output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), repr([('a@a-only.example', ISEMAIL_DNSWARN_NO_MX_RECORD), ('a@aaaa-only.example', ISEMAIL_DNSWARN_NO_MX_RECORD)]))
+
+class TestCommandLine(unittest.TestCase):
+
+    def run_main(self, lines, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(is_email_module.main([*args, f.name]), 0)
+        return out.getvalue().splitlines()
+
+    def test_csv(self):
+        output = self.run_main(['test@iana.org', 'test@'])
+        self.assertEqual(output[0], 'email_address,email_validation_result,email_validity_code,email_diagnosis')
+        self.assertEqual(output[1:], ['test@iana.org,Success,0,ISEMAIL_VALID', 'test@,Error,131,ISEMAIL_ERR_NODOMAIN'])
+
+    def test_jsonl(self):
+        output = [json.loads(line) for line in self.run_main(['"test"@iana.org'], '--format', 'jsonl', '--errorlevel', '16')]
+        self.assertEqual(output, [{
+            'email_address': '"test"@iana.org',
+            'email_validation_result': 'Success',
+            'email_validity_code': ISEMAIL_VALID,
+            'email_diagnosis': 'ISEMAIL_VALID',
+        }])
+
+    def test_dns_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'verdicts.db')
+            with mock.patch('dns.resolver.resolve', return_value=FakeAnswer(300)) as resolve, mock.patch.object(is_email_module, 'dns_cache', None):
+                for _ in range(2):
+                    output = self.run_main(['test@iana.org'], '--dns', '--dns-store', path)
+                    self.assertEqual(output[1:], ['test@iana.org,Success,0,ISEMAIL_VALID'])
+            self.assertEqual(resolve.call_count, 1)
+        self.assertIsNone(is_email_module.domain_store)
+
+    def test_jobs_options(self):
+        for option in (['--dns-concurrency', '8'], ['--progress']):
+            with self.assertRaises(SystemExit) as raised, contextlib.redirect_stderr(io.StringIO()) as err:
+                is_email_module.main(['--dns', '--jobs', '2', *option, '-'])
+            self.assertEqual(raised.exception.code, 2)
+            self.assertIn('cannot be used with --jobs', err.getvalue())
+
+    def test_oversized_input(self):
+        output = self.run_main(['(' + 'a' * 1000000 + ')a@iana.org', 'test@iana.org'])
+        self.assertEqual(output[1].split(',')[1:], ['Error', str(ISEMAIL_ERR_INPUT_TOOLONG), 'ISEMAIL_ERR_INPUT_TOOLONG'])
+        self.assertEqual(output[2], 'test@iana.org,Success,0,ISEMAIL_VALID')
+
+class TestLambdaHandler(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(is_email_module, '_check_dns', return_value=(True, (), 'MX'))
+        self.check_dns = patcher.start()
+        self.addCleanup(patcher.stop)
+        lambda_function.result_cache.clear()
+
+    def test_single_address(self):
+        response = lambda_function.lambda_handler({'queryStringParameters': {'email_address': 'test@iana.org'}}, None)
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body'])['email_diagnosis'], 'ISEMAIL_VALID')
+
+    def test_batch(self):
+        addresses = ['a@iana.org', 'test@', 'b@iana.org']
+        response = lambda_function.lambda_handler({'body': json.dumps(addresses)}, None)
+        self.assertEqual(response['statusCode'], 200)
+        results = json.loads(response['body'])['results']
+        self.assertEqual([result['email_address'] for result in results], addresses)
+        self.assertEqual([result['email_validation_result'] for result in results], ['Success', 'Error', 'Success'])
+        self.assertEqual(self.check_dns.call_count, 1)
+
+    def test_batch_rejected(self):
+        for body in ('not json', '{"a": 1}', '[1, 2]', json.dumps(['a@b.c'] * (lambda_function.MAX_BATCH_SIZE + 1))):
+            response = lambda_function.lambda_handler({'body': body}, None)
+            self.assertEqual(response['statusCode'], 400)
+
+    def test_oversized_input(self):
+        address = '"' + 'a' * 1000000 + '"@iana.org'
+        response = lambda_function.lambda_handler({'queryStringParameters': {'email_address': address}}, None)
+        self.assertEqual(json.loads(response['body'])['email_diagnosis'], 'ISEMAIL_ERR_INPUT_TOOLONG')
+        response = lambda_function.lambda_handler({'body': json.dumps([address[:5000], 'a@iana.org'])}, None)
+        self.assertEqual([result['email_validation_result'] for result in json.loads(response['body'])['results']], ['Error', 'Success'])
+        with mock.patch.object(lambda_function, 'MAX_BODY_SIZE', 10000):
+            response = lambda_function.lambda_handler({'body': json.dumps([address])}, None)
+        self.assertEqual(response['statusCode'], 400)
+
+    def test_batch_base64(self):
+        body = base64.b64encode(json.dumps(['a@iana.org']).encode()).decode()
+        response = lambda_function.lambda_handler({'body': body, 'isBase64Encoded': True}, None)
+        self.assertEqual(response['statusCode'], 200)
+        for body in ('abc', base64.b64encode(b'["\xff@iana.org"]').decode()):
+            response = lambda_function.lambda_handler({'body': body, 'isBase64Encoded': True}, None)
+            self.assertEqual(response['statusCode'], 400)
+
+class TestLazyDNSImport(unittest.TestCase):
+
+    def test_import_does_not_load_dnspython(self):
+        result = subprocess.run([sys.executable, '-c', 'import is_email, sys; is_email.is_email("test@iana.org"); print("dns" in sys.modules)'], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), 'False')
+
+    def test_missing_dnspython(self):
+        with mock.patch.dict(sys.modules, {'dns.resolver': None}):
+            with self.assertRaisesRegex(ImportError, 'dnspython'):
+                is_email('test@iana.org', True)
+
+class TestIsEmailAsync(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(is_email_module, 'dns_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_matches_is_email(self):
+        for address in load_addresses():
+            self.assertEqual(asyncio.run(is_email_async(address, False, True)), is_email(address, False, True))
+
+    def test_options(self):
+        addresses = [b'a@iana.org', 'b\u00e9@iana.org'.encode(), b'c@[1.2.3.4]', b'd@', 'a&amp;b@iana.org']
+
+        async def collect(**options):
+            return [result async for result in is_email_many_async(addresses, False, True, **options)]
+
+        for options in ({'non_ascii': 'utf-8'}, {'engine': 'dfa'}, {'decode': False}):
+            self.assertEqual(asyncio.run(collect(**options)), list(is_email_many(addresses, False, True, **options)))
+            for address in addresses:
+                self.assertEqual(asyncio.run(is_email_async(address, False, True, **options)), is_email(address, False, True, **options))
+
+    def test_cache(self):
+        cache = ResultCache()
+        addresses = ['a@iana.org', 'test@', 'A@iana.org']
+
+        async def collect():
+            return [result async for result in is_email_many_async(addresses, False, True, cache=cache)]
+
+        first = asyncio.run(collect())
+        self.assertEqual(asyncio.run(collect()), first)
+        self.assertEqual(cache.hits, 3)
+        self.assertEqual(asyncio.run(is_email_async('test@', False, True, cache=cache)), ISEMAIL_ERR_NODOMAIN)
+        self.assertEqual(cache.hits, 4)
+
+    def test_many_deduplicates_domains(self):
+        in_flight = []
+        peak = []
+
+        async def resolve(name, rdtype):
+            in_flight.append(name)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(name)
+            if name.startswith('nomx'):
+                raise dns.resolver.NXDOMAIN
+            return FakeAnswer(300)
+
+        async def collect(addresses):
+            return [result async for result in is_email_many_async(addresses, True, True, concurrency=2)]
+
+        addresses = ['a@one.com', 'b@two.com', 'c@one.com', 'bad@', 'd@nomx.com', 'e@three.com', 'f@two.com']
+        with mock.patch('dns.asyncresolver.resolve', side_effect=resolve) as resolve_mock:
+            results = asyncio.run(collect(addresses))
+
+        self.assertEqual([address for address, _, _ in results], addresses)
+        self.assertEqual([status for _, status, _ in results], [ISEMAIL_VALID, ISEMAIL_VALID, ISEMAIL_VALID, ISEMAIL_ERR_NODOMAIN, ISEMAIL_DNSWARN_NO_RECORD, ISEMAIL_VALID, ISEMAIL_VALID])
+        self.assertEqual(resolve_mock.call_count, 4)
+        self.assertLessEqual(max(peak), 2)
+
 if __name__ == '__main__':
     unittest.main()